@@ -0,0 +1,37 @@
+"""tg_posts unique (tg_channel_id, post_id)
+
+Revision ID: rev20261018T101500
+Revises: rev20250710T143509
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'rev20261018T101500'
+down_revision: Union[str, None] = 'rev20250710T143509'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the first migration named the channel column after the redis set, the model calls it tg_channel_id
+    op.alter_column('tg_posts', 'channel_tasks', new_column_name='tg_channel_id')
+    # keep the first copy of every post, older ingests did not dedupe per channel
+    op.execute(
+        """
+        DELETE FROM tg_posts a
+        USING tg_posts b
+        WHERE a.tg_channel_id = b.tg_channel_id AND a.post_id = b.post_id AND a.id > b.id
+        """
+    )
+    op.create_unique_constraint('uq_tg_posts_channel_post', 'tg_posts', ['tg_channel_id', 'post_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_tg_posts_channel_post', 'tg_posts', type_='unique')
+    op.alter_column('tg_posts', 'tg_channel_id', new_column_name='channel_tasks')
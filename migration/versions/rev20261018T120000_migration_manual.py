@@ -0,0 +1,112 @@
+"""tg_posts partitioned by month of tg_pb_date
+
+Revision ID: rev20261018T120000
+Revises: rev20261018T101500
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'rev20261018T120000'
+down_revision: Union[str, None] = 'rev20261018T101500'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COLUMNS = 'id, created_at, updated_at, post_id, tg_channel_id, tg_pb_date, content, link'
+
+
+def _create_tg_posts(partitioned: bool) -> None:
+    op.create_table(
+        'tg_posts',
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('tg_posts_id_seq')"), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('tg_channel_id', sa.String(), server_default='', nullable=False),
+        sa.Column('tg_pb_date', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('content', sa.String(), server_default='', nullable=False),
+        sa.Column('link', sa.String(), server_default='', nullable=False),
+        *(
+            (
+                sa.PrimaryKeyConstraint('id', 'tg_pb_date'),
+                sa.UniqueConstraint('tg_channel_id', 'post_id', 'tg_pb_date', name='uq_tg_posts_channel_post'),
+            )
+            if partitioned
+            else (
+                sa.PrimaryKeyConstraint('id'),
+                sa.UniqueConstraint('id'),
+                sa.UniqueConstraint('tg_channel_id', 'post_id', name='uq_tg_posts_channel_post'),
+            )
+        ),
+        **({'postgresql_partition_by': 'RANGE (tg_pb_date)'} if partitioned else {}),
+    )
+
+
+def upgrade() -> None:
+    op.rename_table('tg_posts', 'tg_posts_heap')
+    op.execute('ALTER TABLE tg_posts_heap RENAME CONSTRAINT tg_posts_pkey TO tg_posts_heap_pkey')
+    op.execute('ALTER TABLE tg_posts_heap RENAME CONSTRAINT tg_posts_id_key TO tg_posts_heap_id_key')
+    op.execute('ALTER TABLE tg_posts_heap RENAME CONSTRAINT uq_tg_posts_channel_post TO uq_tg_posts_heap_channel_post')
+    # the serial sequence outlives the old table and keeps numbering the posts
+    op.execute('ALTER SEQUENCE tg_posts_id_seq OWNED BY NONE')
+
+    _create_tg_posts(partitioned=True)
+    op.create_index('ix_tg_posts_channel_pb_date', 'tg_posts', ['tg_channel_id', 'tg_pb_date', 'post_id'])
+    # monthly partitions, bounds are UTC months; the advisory lock serializes workers creating the same partition
+    op.execute(
+        """
+        CREATE FUNCTION tg_posts_ensure_partition(ts timestamptz) RETURNS text
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            month_start timestamptz := date_trunc('month', ts AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+            -- the month is added to the UTC wall time, in the session time zone a DST change would shift the bound
+            month_end timestamptz := (date_trunc('month', ts AT TIME ZONE 'UTC') + interval '1 month') AT TIME ZONE 'UTC';
+            partition_name text := 'tg_posts_' || to_char(ts AT TIME ZONE 'UTC', '"y"YYYY"m"MM');
+        BEGIN
+            IF to_regclass(partition_name) IS NULL THEN
+                PERFORM pg_advisory_xact_lock(hashtext(partition_name));
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF tg_posts FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            END IF;
+            RETURN partition_name;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        SELECT tg_posts_ensure_partition(month)
+        FROM (SELECT DISTINCT date_trunc('month', tg_pb_date AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS month FROM tg_posts_heap) AS months
+        """
+    )
+    op.execute(f'INSERT INTO tg_posts ({_COLUMNS}) SELECT {_COLUMNS} FROM tg_posts_heap')
+    op.drop_table('tg_posts_heap')
+    op.execute('ALTER SEQUENCE tg_posts_id_seq OWNED BY tg_posts.id')
+
+
+def downgrade() -> None:
+    op.rename_table('tg_posts', 'tg_posts_partitioned')
+    op.execute('ALTER TABLE tg_posts_partitioned RENAME CONSTRAINT tg_posts_pkey TO tg_posts_partitioned_pkey')
+    op.execute('ALTER TABLE tg_posts_partitioned RENAME CONSTRAINT uq_tg_posts_channel_post TO uq_tg_posts_partitioned_channel_post')
+    op.execute('ALTER SEQUENCE tg_posts_id_seq OWNED BY NONE')
+
+    _create_tg_posts(partitioned=False)
+    # ids stay unique across partitions, the sequence is shared; a post stored under two dates keeps its first copy
+    op.execute(
+        f"""
+        INSERT INTO tg_posts ({_COLUMNS})
+        SELECT {_COLUMNS} FROM tg_posts_partitioned
+        ORDER BY id
+        ON CONFLICT (tg_channel_id, post_id) DO NOTHING
+        """
+    )
+    op.drop_table('tg_posts_partitioned')
+    op.execute('DROP FUNCTION tg_posts_ensure_partition(timestamptz)')
+    op.execute('ALTER SEQUENCE tg_posts_id_seq OWNED BY tg_posts.id')
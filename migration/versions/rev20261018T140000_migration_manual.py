@@ -0,0 +1,30 @@
+"""tg_posts full-text search column
+
+Revision ID: rev20261018T140000
+Revises: rev20261018T120000
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'rev20261018T140000'
+down_revision: Union[str, None] = 'rev20261018T120000'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # added to the partitioned parent, every partition gets the column and its own index
+    op.add_column('tg_posts', sa.Column('content_tsv', postgresql.TSVECTOR(), sa.Computed("to_tsvector('simple', content)", persisted=True)))
+    op.create_index('ix_tg_posts_content_tsv', 'tg_posts', ['content_tsv'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tg_posts_content_tsv', table_name='tg_posts')
+    op.drop_column('tg_posts', 'content_tsv')
@@ -0,0 +1,43 @@
+"""channel_stats
+
+Revision ID: rev20261018T160000
+Revises: rev20261018T140000
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'rev20261018T160000'
+down_revision: Union[str, None] = 'rev20261018T140000'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('channel_stats',
+    sa.Column('tg_channel_id', sa.String(), nullable=False),
+    sa.Column('posts_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('first_pb_date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_pb_date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_post_id', sa.Integer(), nullable=False),
+    sa.Column('last_ingested_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('tg_channel_id')
+    )
+    # one last full scan, from now on ingests keep the table up to date
+    op.execute(
+        """
+        INSERT INTO channel_stats (tg_channel_id, posts_count, first_pb_date, last_pb_date, last_post_id, last_ingested_at)
+        SELECT tg_channel_id, count(*), min(tg_pb_date), max(tg_pb_date), max(post_id), max(created_at)
+        FROM tg_posts
+        GROUP BY tg_channel_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('channel_stats')
@@ -1,18 +1,34 @@
 import contextlib
+import time
 from collections.abc import AsyncIterator
 from typing import Any
 
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
+from src.dto.db_pool import DbPoolMetrics
 from src.env import settings
 
 
 # Heavily inspired by https://praciano.com.br/fastapi-and-async-sqlalchemy-20-with-pytest-done-right.html
 class DBM:
     def __init__(self, host: str, engine_kwargs: dict[str, Any] | None = None) -> None:
-        engine_kwargs = engine_kwargs or {}
+        engine_kwargs = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+            **(engine_kwargs or {}),
+        }
+        self._pool_size: int = engine_kwargs["pool_size"]
+        self._max_overflow: int = engine_kwargs["max_overflow"]
         self._engine: AsyncEngine = create_async_engine(host, **engine_kwargs)
         self._sessionmaker = async_sessionmaker(autocommit=False, bind=self._engine, expire_on_commit=False)
+        self._checkouts = 0
+        self._checkout_timeouts = 0
+        self._checkout_seconds_total = 0.0
+        self._checkout_seconds_max = 0.0
 
     @contextlib.asynccontextmanager
     async def session(self) -> AsyncIterator[AsyncSession]:
@@ -21,6 +37,14 @@ class DBM:
 
         session = self._sessionmaker()
         try:
+            # the connection is taken from the pool up front to measure how long sessions wait for it
+            started_at = time.monotonic()
+            try:
+                await session.connection()
+            except PoolTimeoutError:
+                self._checkout_timeouts += 1
+                raise
+            self._record_checkout(time.monotonic() - started_at)
             yield session
         except Exception:
             await session.rollback()
@@ -28,6 +52,26 @@ class DBM:
         finally:
             await session.close()
 
+    def _record_checkout(self, seconds: float) -> None:
+        self._checkouts += 1
+        self._checkout_seconds_total += seconds
+        self._checkout_seconds_max = max(self._checkout_seconds_max, seconds)
+
+    def pool_metrics(self) -> DbPoolMetrics:
+        pool = self._engine.pool
+        checked_out = pool.checkedout()  # type: ignore[attr-defined]
+        return DbPoolMetrics(
+            pool_size=self._pool_size,
+            max_overflow=self._max_overflow,
+            checked_out=checked_out,
+            overflow=max(0, pool.overflow()),  # type: ignore[attr-defined]
+            saturation=checked_out / max(1, self._pool_size + self._max_overflow),
+            checkouts=self._checkouts,
+            checkout_timeouts=self._checkout_timeouts,
+            checkout_seconds_avg=self._checkout_seconds_total / max(1, self._checkouts),
+            checkout_seconds_max=self._checkout_seconds_max,
+        )
+
     async def close_connection(self) -> None:
         await self._engine.dispose()
 
@@ -45,7 +89,7 @@ def get_db_main_manager(new_connection: bool = False) -> DBM:
     return _db
 
 
-async def get_db_main() -> AsyncSession:
-    db = get_db_main_manager()
-    async with db.session() as session:
-        return session
+async def get_db_main() -> AsyncIterator[AsyncSession]:
+    """Session of a request, returned to the pool once the response is sent."""
+    async with get_db_main_manager().session() as session:
+        yield session
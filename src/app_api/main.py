@@ -3,6 +3,8 @@ import logging
 from fastapi import FastAPI
 
 from src.app_api.middlewares import log_extra_middleware
+from src.app_api.routes.metrics_router import metrics_router
+from src.app_api.routes.posts_router import posts_router
 from src.app_api.routes.tg_parser_router import tg_parser_router
 from src.errors import ApiError, api_error_handler
 
@@ -15,6 +17,8 @@ def get_app() -> FastAPI:
 
     # routes
     app.include_router(tg_parser_router)
+    app.include_router(posts_router)
+    app.include_router(metrics_router)
 
     # middlewares
     app.middleware("http")(log_extra_middleware)
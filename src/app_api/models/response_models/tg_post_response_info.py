@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from src.db_main.models.channel_stats import ChannelStatsDbMdl
+from src.db_main.models.tg_post import TgPostDbMdl
+from src.dto.post import StoredPost
+
+
+class TgPostApiMdl(StoredPost):
+    @classmethod
+    def from_db(cls, post: TgPostDbMdl) -> "TgPostApiMdl":
+        return cls(channel_name=post.tg_channel_id, post_id=post.post_id, pb_date=post.tg_pb_date, content=post.content, link=post.link)
+
+
+class TgPostSearchHitApiMdl(TgPostApiMdl):
+    rank: float
+
+
+class TgPostSearchResponseApiMdl(BaseModel):
+    data: list[TgPostSearchHitApiMdl]
+    next_cursor: str | None = None
+
+
+class ChannelStatsApiMdl(BaseModel):
+    channel_name: str
+    posts_count: int
+    first_pb_date: datetime
+    last_pb_date: datetime
+    last_post_id: int
+    last_ingested_at: datetime
+
+    @classmethod
+    def from_db(cls, stats: ChannelStatsDbMdl) -> "ChannelStatsApiMdl":
+        return cls(
+            channel_name=stats.tg_channel_id,
+            posts_count=stats.posts_count,
+            first_pb_date=stats.first_pb_date,
+            last_pb_date=stats.last_pb_date,
+            last_post_id=stats.last_post_id,
+            last_ingested_at=stats.last_ingested_at,
+        )
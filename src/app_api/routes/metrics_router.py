@@ -0,0 +1,30 @@
+import logging
+
+from fastapi import APIRouter
+from redis.asyncio import Redis
+
+from src.app_api.dependencies import get_db_main_manager
+from src.db_main.pool_metrics import all_pool_metrics, publish_pool_metrics_async
+from src.db_main.post_cache import post_cache
+from src.dto.db_pool import DbPoolMetrics
+
+logger = logging.getLogger(__name__)
+
+
+metrics_router = APIRouter(
+    tags=["metrics"],
+)
+rds = Redis()
+
+
+@metrics_router.get("/metrics/db_pool")
+async def get_db_pool_metrics() -> dict[str, DbPoolMetrics]:
+    """Connection pool of every api and worker process that used the database lately, keyed by host:pid."""
+    await publish_pool_metrics_async(rds, get_db_main_manager().pool_metrics())
+    return await all_pool_metrics(rds)
+
+
+@metrics_router.get("/metrics/post_cache")
+async def get_post_cache_metrics() -> dict[str, int]:
+    """Hits and misses of the post cache since it was created, and the number of cached pages."""
+    return await post_cache.stats()
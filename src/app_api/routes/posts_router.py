@@ -0,0 +1,100 @@
+import base64
+import json
+import logging
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app_api.dependencies import get_db_main, get_db_main_manager
+from src.app_api.models.response_models.tg_post_response_info import (
+    ChannelStatsApiMdl,
+    TgPostApiMdl,
+    TgPostSearchHitApiMdl,
+    TgPostSearchResponseApiMdl,
+)
+from src.db_main.cruds import channel_stats_crud, tg_post_crud
+from src.env import settings
+from src.errors import InvalidPostsCursorError
+
+logger = logging.getLogger(__name__)
+
+
+posts_router = APIRouter(
+    tags=["posts"],
+)
+
+
+@posts_router.get("/posts", response_class=StreamingResponse)
+async def get_posts(
+    channel_name: str,
+    dt_from: datetime | None = None,
+    dt_to: datetime | None = None,
+    after_pb_date: datetime | None = None,
+    after_post_id: int | None = None,
+    limit: int | None = Query(default=None, gt=0),
+) -> StreamingResponse:
+    """Stored posts of a channel as NDJSON, ordered by (pb_date, post_id).
+
+    Reads with a limit up to POST_CACHE_MAX_MONTH_POSTS are served from the post cache,
+    bigger exports are streamed from postgres in constant memory.
+
+    To resume an interrupted export pass the pb_date and post_id of the last line received as after_pb_date and after_post_id.
+    """
+    if (after_pb_date is None) != (after_post_id is None):
+        raise InvalidPostsCursorError
+    after = (after_pb_date, after_post_id) if after_pb_date is not None and after_post_id is not None else None
+
+    async def lines() -> AsyncIterator[str]:
+        # the session must outlive the handler, the cursor is read while the response is sent
+        async with get_db_main_manager().session() as db:
+            if limit is not None and limit <= settings.POST_CACHE_MAX_MONTH_POSTS:
+                async for post in tg_post_crud.read_tg_posts(db, channel_name, dt_from, dt_to, after=after, limit=limit):
+                    yield post.model_dump_json() + "\n"
+                return
+            async for tg_post in tg_post_crud.stream_tg_posts(db, channel_name, dt_from, dt_to, after=after, limit=limit):
+                yield TgPostApiMdl.from_db(tg_post).model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _encode_search_cursor(rank: float, pb_date: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, pb_date.isoformat(), row_id]).encode("utf-8")).decode("ascii")
+
+
+def _decode_search_cursor(cursor: str) -> tuple[float, datetime, int]:
+    try:
+        rank, pb_date, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(rank), datetime.fromisoformat(pb_date), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidPostsCursorError(f"malformed search cursor: {cursor}") from e
+
+
+@posts_router.get("/posts/search")
+async def search_posts(
+    q: str = Query(min_length=1),
+    channel_name: str | None = None,
+    dt_from: datetime | None = None,
+    dt_to: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=settings.POSTS_SEARCH_PAGE_SIZE, gt=0, le=500),
+    db: AsyncSession = Depends(get_db_main),
+) -> TgPostSearchResponseApiMdl:
+    """Full-text search over post content, best ranked first. Pass next_cursor back as cursor for the next page."""
+    after = _decode_search_cursor(cursor) if cursor is not None else None
+    hits = await tg_post_crud.search_tg_posts(db, q, channel_name, dt_from, dt_to, after=after, limit=limit)
+    next_cursor = None
+    if len(hits) == limit:
+        last_post, last_rank = hits[-1]
+        next_cursor = _encode_search_cursor(last_rank, last_post.tg_pb_date, last_post.id)
+    return TgPostSearchResponseApiMdl(
+        data=[TgPostSearchHitApiMdl(**TgPostApiMdl.from_db(post).model_dump(), rank=rank) for post, rank in hits],
+        next_cursor=next_cursor,
+    )
+
+
+@posts_router.get("/channels/stats")
+async def get_channels_stats(db: AsyncSession = Depends(get_db_main)) -> list[ChannelStatsApiMdl]:
+    return [ChannelStatsApiMdl.from_db(stats) for stats in await channel_stats_crud.get_channel_stats(db)]
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+from src.common.intervals import Interval, merge_intervals
+from src.common.moment import as_utc
+from src.dto.post import Source
+from src.dto.redis_task import ManagerEvent, RedisTask, Task
+
+
+def coalesce_tasks(tasks: list[Task]) -> list[Task]:
+    """Merges overlapping and adjacent ranges claimed from one channel queue."""
+    if not tasks:
+        return []
+    merged = merge_intervals([(as_utc(tsk.dt_from), as_utc(tsk.dt_to)) for tsk in tasks])
+    return [tasks[0].model_copy(update={"dt_from": dt_from, "dt_to": dt_to}) for dt_from, dt_to in merged]
+
+
+async def enqueue_channel_task(
+    rds: Redis,
+    source: Source,
+    channel_name: str,
+    dt_from: datetime,
+    dt_to: datetime,
+    priority: int | None = None,
+) -> list[Interval]:
+    """Queues a range of a channel, merged with the ranges already waiting in its queue.
+
+    The queue is rewritten in a WATCH/MULTI transaction, which is retried if the manager
+    claims from it in between. `priority` sets the scheduling weight of the channel.
+    Returns the ranges queued for the channel afterwards.
+    """
+    task_name = f"{source.value}${channel_name}"
+    async with rds.pipeline() as pipe:
+        while True:
+            try:
+                await pipe.watch(task_name)
+                items = await pipe.lrange(task_name, 0, -1)
+                queued = [
+                    (as_utc(datetime.fromisoformat(dt_from_raw.decode("utf-8"))), as_utc(datetime.fromisoformat(dt_to_raw.decode("utf-8"))))
+                    for dt_from_raw, dt_to_raw in zip(items[::2], items[1::2], strict=True)
+                ]
+                merged = merge_intervals([*queued, (as_utc(dt_from), as_utc(dt_to))])
+                pipe.multi()
+                pipe.delete(task_name)
+                pipe.rpush(task_name, *[dt.isoformat() for interval in merged for dt in interval])
+                pipe.sadd(str(RedisTask.channel_tasks.value), task_name)
+                if priority is not None:
+                    pipe.hset(str(RedisTask.channel_priorities.value), task_name, priority)
+                pipe.rpush(str(RedisTask.manager_events.value), ManagerEvent.enqueued.value)
+                await pipe.execute()
+                return merged
+            except WatchError:
+                continue
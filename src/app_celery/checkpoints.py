@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+from redis import Redis
+
+from src.common.moment import as_utc
+from src.dto.redis_task import RedisTask, Task
+from src.env import settings
+
+
+class Checkpoint(BaseModel):
+    """Progress of a task through the posts streamed by the scraper, in the order they arrive."""
+
+    first_pb_date: datetime
+    last_pb_date: datetime
+    last_post_id: int
+    posts: int
+
+
+def advance(checkpoint: Checkpoint | None, batch: list[dict[str, str]]) -> Checkpoint | None:
+    """Moves the checkpoint past a stored batch of raw scraper posts. Posts without a valid date or id are skipped."""
+    for post in batch:
+        try:
+            pb_date, post_id = as_utc(datetime.fromisoformat(post["pb_date"])), int(post["post_id"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if checkpoint is None:
+            checkpoint = Checkpoint(first_pb_date=pb_date, last_pb_date=pb_date, last_post_id=post_id, posts=0)
+        checkpoint.last_pb_date, checkpoint.last_post_id = pb_date, post_id
+        checkpoint.posts += 1
+    return checkpoint
+
+
+def resume_task(tsk: Task, checkpoint: Checkpoint) -> Task:
+    """The part of the range that is left after the checkpoint.
+
+    The scraper streams either oldest or newest posts first, which the checkpoint tells apart
+    once it has seen two dates. The last date is kept in the range, so the posts sharing it are
+    not missed; those already stored are dropped by the dedupe.
+    """
+    if checkpoint.last_pb_date > checkpoint.first_pb_date:
+        return tsk.model_copy(update={"dt_from": max(as_utc(tsk.dt_from), checkpoint.last_pb_date)})
+    if checkpoint.last_pb_date < checkpoint.first_pb_date:
+        return tsk.model_copy(update={"dt_to": min(as_utc(tsk.dt_to), checkpoint.last_pb_date)})
+    return tsk
+
+
+class Checkpoints:
+    """Checkpoints of unfinished tasks, `checkpoint:<source$channel>:<dt_from>:<dt_to>`.
+
+    Keyed by the range rather than the celery task id, so celery retries and the tasks
+    re-dispatched by the manager after a lost lease both find the progress of the range.
+    """
+
+    def __init__(self, rds: Redis) -> None:
+        self._rds = rds
+
+    @staticmethod
+    def _key(tsk: Task) -> str:
+        return f"{RedisTask.checkpoints.value}:{tsk.source}${tsk.channel_name}:{as_utc(tsk.dt_from).isoformat()}:{as_utc(tsk.dt_to).isoformat()}"
+
+    def get(self, tsk: Task) -> Checkpoint | None:
+        raw = self._rds.get(self._key(tsk))
+        return Checkpoint.model_validate_json(raw) if raw is not None else None
+
+    def save(self, tsk: Task, checkpoint: Checkpoint) -> None:
+        self._rds.set(self._key(tsk), checkpoint.model_dump_json(), ex=settings.CHECKPOINT_TTL)
+
+    def clear(self, tsk: Task) -> None:
+        self._rds.delete(self._key(tsk))
@@ -0,0 +1,89 @@
+import logging
+from datetime import datetime
+
+from redis import Redis
+
+from src.dto.redis_task import RedisTask, Task
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] is the channel_tasks set, KEYS[2..] are `source$channel` queues.
+# ARGV[i] is how many (dt_from, dt_to) pairs to pop from KEYS[i + 1], a negative count pops all of them, 0 none.
+# Returns the popped items of every queue, then the items dropped from them.
+# Pairs are pushed by a single RPUSH, so a last item without its pair never gets one: it is dropped
+# with the rest of the queue, and drained queues are removed from the set in the same call.
+_CLAIM_LUA = """
+local claimed = {}
+local dropped = {}
+for i = 2, #KEYS do
+    local key = KEYS[i]
+    local count = tonumber(ARGV[i - 1])
+    local taken = {}
+    if count ~= 0 then
+        local last = 2 * count - 1
+        if count < 0 then
+            last = -1
+        end
+        local items = redis.call('LRANGE', key, 0, last)
+        for j = 1, #items - #items % 2 do
+            taken[j] = items[j]
+        end
+        if #taken > 0 then
+            redis.call('LTRIM', key, #taken, -1)
+        end
+        if redis.call('LLEN', key) == 1 then
+            dropped[#dropped + 1] = key
+            dropped[#dropped + 1] = redis.call('LPOP', key)
+        end
+        if redis.call('LLEN', key) == 0 then
+            redis.call('SREM', KEYS[1], key)
+        end
+    end
+    claimed[i - 1] = taken
+end
+claimed[#KEYS] = dropped
+return claimed
+"""
+
+
+CLAIM_ALL = -1
+
+
+class ChannelTaskClaimer:
+    """Atomically pops queued ranges from many channel queues in a single round trip."""
+
+    def __init__(self, rds: Redis) -> None:
+        self._claim = rds.register_script(_CLAIM_LUA)
+
+    def claim(self, counts: dict[str, int]) -> dict[str, list[Task]]:
+        """Pops up to `counts[task_name]` ranges (all of them for CLAIM_ALL) from every `source$channel` queue."""
+        if not counts:
+            return {}
+        task_names = list(counts)
+        *raw, dropped = self._claim(keys=[str(RedisTask.channel_tasks.value), *task_names], args=[counts[name] for name in task_names])
+        for task_name, item in zip(dropped[::2], dropped[1::2], strict=True):
+            logger.warning(f"dropped a range bound without its pair {task_name.decode('utf-8')} :: {item!r}")
+        claimed: dict[str, list[Task]] = {}
+        for task_name, items in zip(task_names, raw, strict=True):
+            claimed[task_name] = parse_channel_tasks(task_name, items)
+        return claimed
+
+
+def parse_channel_tasks(task_name: str, items: list[bytes]) -> list[Task]:
+    if not items:
+        return []
+    source, channel_name = task_name.split('$', maxsplit=1)
+    tasks: list[Task] = []
+    for dt_from, dt_to in zip(items[::2], items[1::2], strict=True):
+        try:
+            tasks.append(
+                Task(
+                    source=source,
+                    channel_name=channel_name,
+                    dt_from=datetime.fromisoformat(dt_from.decode("utf-8")),
+                    dt_to=datetime.fromisoformat(dt_to.decode("utf-8")),
+                )
+            )
+        except ValueError:
+            logger.warning(f'Invalid Task parameters {task_name} :: {dt_from!r} - {dt_to!r}')
+    return tasks
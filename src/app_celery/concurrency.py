@@ -0,0 +1,91 @@
+import logging
+import math
+import statistics
+
+from pydantic import BaseModel
+from redis import Redis
+
+from src.dto.redis_task import RedisTask
+from src.env import settings
+
+logger = logging.getLogger(__name__)
+
+SCRAPER_CALLS_WINDOW = 100  # samples kept between two adjustments
+
+
+def is_overload(status_code: int) -> bool:
+    """Tells if a scraper response (0 for a failed request) means the scraper cannot keep up."""
+    return status_code == 0 or status_code == 429 or status_code >= 500
+
+
+class ScraperCallSample(BaseModel):
+    status_code: int  # 0 when the request failed before a response arrived
+    latency: float  # seconds until the response headers, the posts are streamed after them and do not count
+
+    @property
+    def is_overload(self) -> bool:
+        return is_overload(self.status_code)
+
+
+def record_scraper_call(rds: Redis, status_code: int, latency: float) -> None:
+    pipe = rds.pipeline()
+    pipe.lpush(str(RedisTask.scraper_calls.value), ScraperCallSample(status_code=status_code, latency=latency).model_dump_json())
+    pipe.ltrim(str(RedisTask.scraper_calls.value), 0, SCRAPER_CALLS_WINDOW - 1)
+    pipe.execute()
+
+
+def aimd_step(limit: int, samples: list[ScraperCallSample], saturated: bool) -> int:
+    """Additive increase / multiplicative decrease of the number of in-flight parse_api tasks.
+
+    The limit is cut on any sign of scraper overload (429, 5xx, transport errors, slow answers
+    or too many failed calls) and grows by one when all slots were busy and the scraper kept up.
+    Only the time to the response headers is compared to the target: how long the posts take to arrive
+    depends on the size of the range, not on the load of the scraper.
+    """
+    if not samples:
+        return limit
+    error_rate = sum(1 for s in samples if s.status_code != 200) / len(samples)
+    overloaded = (
+        any(s.is_overload for s in samples)
+        or error_rate > settings.CONCURRENCY_MAX_ERROR_RATE
+        or statistics.median(s.latency for s in samples) > settings.CONCURRENCY_LATENCY_TARGET
+    )
+    if overloaded:
+        limit = math.floor(limit * settings.CONCURRENCY_DECREASE_FACTOR)
+    elif saturated:
+        limit += 1
+    return max(settings.CONCURRENCY_MIN, min(settings.concurrency_max, limit))
+
+
+class ConcurrencyController:
+    """Decides how many parse_api tasks may run at once.
+
+    A value in `cow_override` (set from the dashboard) wins; otherwise the limit in `cow`
+    is adjusted by aimd_step from the scraper calls reported by the workers since the last round.
+    The effective limit is always written back to `cow`, so the dashboard shows what is in use.
+    """
+
+    def __init__(self, rds: Redis) -> None:
+        self._rds = rds
+
+    def limit(self, running: int, waiting: bool) -> int:
+        """Returns the limit for this round; `running` tasks are in flight and `waiting` tells if ranges are queued."""
+        cow_key = str(RedisTask.counter_of_workers.value)
+        pipe = self._rds.pipeline()
+        pipe.get(str(RedisTask.counter_of_workers_override.value))
+        pipe.get(cow_key)
+        pipe.lrange(str(RedisTask.scraper_calls.value), 0, -1)
+        pipe.delete(str(RedisTask.scraper_calls.value))
+        override, current, raw_samples, _ = pipe.execute()
+
+        if override is not None:
+            limit = int(override)
+        else:
+            limit = int(current) if current is not None else settings.CONCURRENCY_DEFAULT
+            samples = [ScraperCallSample.model_validate_json(raw) for raw in raw_samples]
+            new_limit = aimd_step(limit, samples, saturated=waiting and running >= limit)
+            if new_limit != limit:
+                logger.info(f"concurrency limit {limit} -> {new_limit} ({len(samples)} scraper calls)")
+            limit = new_limit
+        self._rds.set(cow_key, limit)
+        return limit
@@ -0,0 +1,57 @@
+import math
+from datetime import datetime, timezone
+
+from redis import Redis
+
+from src.common.intervals import Interval
+from src.common.moment import as_utc
+from src.dto.redis_task import RedisTask
+
+# KEYS[1] is the coverage sorted set of a channel queue, ARGV is the new [from, to) in epoch seconds.
+# Members are "from:to" scored by from; everything the new interval overlaps or touches is merged into it.
+_ADD_LUA = """
+local from = tonumber(ARGV[1])
+local to = tonumber(ARGV[2])
+for _, member in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', to)) do
+    local sep = string.find(member, ':', 1, true)
+    local member_from = tonumber(string.sub(member, 1, sep - 1))
+    local member_to = tonumber(string.sub(member, sep + 1))
+    if member_to >= from then
+        redis.call('ZREM', KEYS[1], member)
+        from = math.min(from, member_from)
+        to = math.max(to, member_to)
+    end
+end
+redis.call('ZADD', KEYS[1], from, string.format('%d:%d', from, to))
+"""
+
+
+class CoverageIndex:
+    """Ranges of every channel queue that were already scraped and ingested.
+
+    Each `coverage:<source$channel>` sorted set holds disjoint intervals with whole-second bounds.
+    Bounds are rounded inwards, so the index never claims a second that was not actually scraped.
+    """
+
+    def __init__(self, rds: Redis) -> None:
+        self._rds = rds
+        self._add = rds.register_script(_ADD_LUA)
+
+    @staticmethod
+    def _key(task_name: str) -> str:
+        return f"{RedisTask.coverage.value}:{task_name}"
+
+    def add(self, task_name: str, dt_from: datetime, dt_to: datetime) -> None:
+        ts_from, ts_to = math.ceil(as_utc(dt_from).timestamp()), math.floor(as_utc(dt_to).timestamp())
+        if ts_from < ts_to:
+            self._add(keys=[self._key(task_name)], args=[ts_from, ts_to])
+
+    def covered(self, task_name: str, dt_from: datetime, dt_to: datetime) -> list[Interval]:
+        """Returns the covered intervals that overlap [dt_from, dt_to)."""
+        ts_from = as_utc(dt_from).timestamp()
+        intervals: list[Interval] = []
+        for member in self._rds.zrangebyscore(self._key(task_name), "-inf", as_utc(dt_to).timestamp()):
+            start, end = (int(ts) for ts in member.decode("utf-8").split(":"))
+            if end > ts_from:
+                intervals.append((datetime.fromtimestamp(start, timezone.utc), datetime.fromtimestamp(end, timezone.utc)))
+        return intervals
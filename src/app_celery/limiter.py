@@ -0,0 +1,154 @@
+import logging
+import time
+
+from redis import Redis
+
+from src.dto.redis_task import RedisTask, Task
+from src.env import settings
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] is the bucket hash, ARGV is rate (tokens/s), burst and the current time.
+# Takes a token if there is one, returns how many seconds to wait otherwise.
+_TAKE_TOKEN_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """Request rate limit of one scraper, shared by every worker through redis."""
+
+    def __init__(self, rds: Redis, scraper: str, rate: float = settings.SCRAPER_RATE, burst: int = settings.SCRAPER_BURST) -> None:
+        self._key = f"{RedisTask.scraper_rate_limit.value}:{scraper}"
+        self._rate = rate
+        self._burst = burst
+        self._take = rds.register_script(_TAKE_TOKEN_LUA)
+
+    def try_acquire(self) -> float:
+        """Takes a token. Returns 0 on success or the seconds to wait before the next try."""
+        return float(self._take(keys=[self._key], args=[self._rate, self._burst, time.time()]))
+
+    def acquire(self) -> None:
+        while (wait := self.try_acquire()) > 0:
+            time.sleep(wait)
+
+
+# KEYS[1] is the breaker hash, ARGV is the threshold, the base cool-down, the max cool-down and the current time.
+# Failures while the breaker is open do not count, so concurrent callers trip it once and never shorten it.
+# Returns the cool-down of a new trip and the number of trips, or an empty cool-down.
+_RECORD_FAILURE_LUA = """
+local threshold = tonumber(ARGV[1])
+local now = tonumber(ARGV[4])
+local opened_until = tonumber(redis.call('HGET', KEYS[1], 'opened_until')) or 0
+if opened_until > now then
+    return {'', 0}
+end
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+if failures < threshold then
+    return {'', 0}
+end
+local trips = redis.call('HINCRBY', KEYS[1], 'trips', 1)
+local cooldown = math.min(tonumber(ARGV[3]), tonumber(ARGV[2]) * 2 ^ (trips - 1))
+redis.call('HSET', KEYS[1], 'opened_until', tostring(now + cooldown), 'failures', threshold - 1)
+return {tostring(cooldown), trips}
+"""
+
+
+class CircuitBreaker:
+    """Stops traffic to a failing scraper.
+
+    The breaker opens after SCRAPER_BREAKER_THRESHOLD failures in a row and stays open for a cool-down
+    that doubles with every consecutive trip. When it runs out, calls are let through again, but a single
+    failure re-opens it; a success closes it for good.
+    """
+
+    def __init__(self, rds: Redis, scraper: str) -> None:
+        self._rds = rds
+        self._key = f"{RedisTask.scraper_breaker.value}:{scraper}"
+        self._record_failure = rds.register_script(_RECORD_FAILURE_LUA)
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets calls through, 0 if it is closed."""
+        opened_until = self._rds.hget(self._key, "opened_until")
+        return max(0.0, float(opened_until or 0) - time.time())
+
+    def is_open(self) -> bool:
+        return self.retry_after() > 0
+
+    def record_success(self) -> None:
+        self._rds.delete(self._key)
+
+    def record_failure(self) -> None:
+        cooldown, trips = self._record_failure(
+            keys=[self._key],
+            args=[settings.SCRAPER_BREAKER_THRESHOLD, settings.SCRAPER_BREAKER_COOLDOWN, settings.SCRAPER_RETRY_MAX_DELAY, time.time()],
+        )
+        if cooldown:
+            logger.warning(f"scraper circuit breaker opened for {float(cooldown):.0f}s ({trips} trips)")
+
+
+def retry_delay(retries: int) -> int:
+    """Exponential backoff of parse_api retries."""
+    return min(settings.SCRAPER_RETRY_MAX_DELAY, settings.SCRAPER_RETRY_DELAY * 2**retries)
+
+
+class DeadLetter:
+    """Channel queues that keep failing.
+
+    Every shard that ran out of retries is kept in `dead_letter:<source$channel>` and counted;
+    after DEAD_LETTER_AFTER such shards in a row the queue lands in the `dead_letter` set
+    and the manager stops dispatching it. A successful shard resets the count.
+    `release` takes a queue out of the dead letter from the dashboard, with the shards that failed.
+    """
+
+    def __init__(self, rds: Redis) -> None:
+        self._rds = rds
+        self._channels_key = str(RedisTask.dead_letter.value)
+        self._failures_key = str(RedisTask.channel_failures.value)
+
+    def record_failure(self, task_name: str, task_json: str) -> bool:
+        """Returns True if the queue was moved to the dead-letter set."""
+        pipe = self._rds.pipeline()
+        pipe.rpush(f"{self._channels_key}:{task_name}", task_json)
+        pipe.hincrby(self._failures_key, task_name, 1)
+        _, failures = pipe.execute()
+        if failures < settings.DEAD_LETTER_AFTER:
+            return False
+        self._rds.sadd(self._channels_key, task_name)
+        logger.error(f"channel moved to dead letter after {failures} failed tasks :: {task_name}")
+        return True
+
+    def record_success(self, task_name: str) -> None:
+        self._rds.hdel(self._failures_key, task_name)
+
+    def channels(self) -> set[str]:
+        return {name.decode("utf-8") for name in self._rds.smembers(self._channels_key)}
+
+    def failed_tasks(self, task_name: str) -> list[Task]:
+        return [Task.model_validate_json(raw) for raw in self._rds.lrange(f"{self._channels_key}:{task_name}", 0, -1)]
+
+    def release(self, task_name: str) -> list[Task]:
+        """Lets the manager dispatch the queue again and returns its failed shards, which are forgotten unless queued again."""
+        pipe = self._rds.pipeline()
+        pipe.lrange(f"{self._channels_key}:{task_name}", 0, -1)
+        pipe.delete(f"{self._channels_key}:{task_name}")
+        pipe.srem(self._channels_key, task_name)
+        pipe.hdel(self._failures_key, task_name)
+        raw, *_ = pipe.execute()
+        logger.info(f"channel released from dead letter with {len(raw)} failed tasks :: {task_name}")
+        return [Task.model_validate_json(task_json) for task_json in raw]
@@ -1,98 +1,225 @@
-import asyncio
+import contextlib
 import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Callable, Iterator
 from datetime import datetime
 
-from redis import Redis
+from redis import Redis, RedisError
+from redis.exceptions import LockError, LockNotOwnedError
+from redis.lock import Lock
 
-from src.app_api.dependencies import get_db_main_manager
+from src import log
+from src.app_celery.channel_queue import coalesce_tasks
+from src.app_celery.claim import CLAIM_ALL, ChannelTaskClaimer
+from src.app_celery.concurrency import ConcurrencyController
+from src.app_celery.coverage import CoverageIndex
+from src.app_celery.limiter import CircuitBreaker, DeadLetter
 from src.app_celery.main import app
-from celery.result import AsyncResult
+from celery import states
+from src.app_celery.scheduler import DEFAULT_PRIORITY, ChannelPriorities, fair_share
+from src.app_celery.shards import ShardQueue, split_task
+from src.app_celery.state import RunningState
 from src.app_celery.tasks import parse_api
-from src.dto.redis_task import RedisTask, Task
+from src.common.moment import as_utc
+from src.dto.redis_task import RedisTask, RunningTask, Task
+from src.env import settings
 
 rds = Redis()
-rds.set(str(RedisTask.counter_of_workers.value), 3)
 
-running_tasks = {}
-running_channels = {}
+running_state = RunningState(rds)
+claimer = ChannelTaskClaimer(rds)
+concurrency = ConcurrencyController(rds)
+shard_queue = ShardQueue(rds)
+coverage = CoverageIndex(rds)
+priorities = ChannelPriorities(rds)
+scraper_breaker = CircuitBreaker(rds, settings.SCRAPER_URL)
+dead_letter = DeadLetter(rds)
 
 logger = logging.getLogger(__name__)
 
 
-class InvalidTelegramTask(Exception):
-    pass
+def running_new_task_worker(task_name: str, tsk: Task):
+    # the task is recorded before it is sent, so a crash in between leaves a pending deadline to reclaim, not a ghost task
+    task_id = str(uuid.uuid4())
+    running_state.add(task_id, task_name, tsk)
+    return parse_api.apply_async((tsk.channel_name, tsk.model_dump_json(indent=4, exclude={"group_id"})), task_id=task_id)
 
 
-def serialize_channel_task(task_name: str) -> Task | None:
+def finished_tasks(task_ids: list[str]) -> dict[str, str]:
+    """Returns the ready state of the tasks that reached one, read from the result backend with a single MGET."""
+    if not task_ids:
+        return {}
+    backend = app.backend
+    metas = backend.mget([backend.get_key_for_task(tid) for tid in task_ids])
+    statuses = {tid: backend.decode_result(meta)["status"] for tid, meta in zip(task_ids, metas, strict=True) if meta is not None}
+    return {tid: status for tid, status in statuses.items() if status in states.READY_STATES}
+
+
+@contextlib.contextmanager
+def _extended(lock: Lock) -> Iterator[None]:
+    """Renews the ttl of a held lock from a background thread while the block runs, however long the round takes."""
+    stop = threading.Event()
+
+    def _renew() -> None:
+        while not stop.wait(settings.MANAGER_LOCK_TTL / 3):
+            try:
+                lock.reacquire()
+            except (LockError, RedisError) as e:
+                logger.warning(f"dispatch lock could not be renewed -- {e}")
+
+    thread = threading.Thread(target=_renew, name="manager-lock", daemon=True)
+    thread.start()
     try:
-        tsk = rds.lrange(task_name, 0, 1)
-        if len(tsk) < 2:
-            return None
-        source, channel_name = task_name.split('$', maxsplit=1)
-        tg_task = Task(
-            source=source,
-            channel_name=channel_name,
-            dt_from=datetime.fromisoformat(tsk[0].decode("utf-8")),
-            dt_to=datetime.fromisoformat(tsk[1].decode("utf-8")),
-        )
-        rds.lrem(task_name, 1, tsk[1])
-        rds.lrem(task_name, 1, tsk[0])
-        return tg_task
-    except InvalidTelegramTask:
-        logger.warning('Invalid Task parameters')
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def dispatch() -> None:
+    """Single scheduling round: forget finished tasks, reclaim lost ones and fill every free worker slot.
+
+    The round runs under a redis lock, so any number of manager processes can call it
+    without dispatching the same range twice. The lock is renewed while the round runs;
+    if another manager holds it, the round is skipped.
+    """
+    # the token is shared with the thread that renews the lock
+    lock = rds.lock(str(RedisTask.manager_lock.value), timeout=settings.MANAGER_LOCK_TTL, blocking_timeout=settings.MANAGER_LOCK_TTL, thread_local=False)
+    if not lock.acquire():
+        logger.info("dispatch round skipped, another manager holds the lock")
+        return
+    try:
+        with _extended(lock):
+            _dispatch()
+    finally:
+        try:
+            lock.release()
+        except LockNotOwnedError:
+            logger.warning("dispatch lock expired before the round ended")
+
+
+def _forget_finished(running: dict[str, RunningTask]) -> None:
+    """Drops the tasks that reached a ready state from `running` and from the running state."""
+    finished = finished_tasks(list(running))
+    for tid, status in finished.items():
+        logger.debug(f"task finished {tid} :: {status}")
+        if status == states.FAILURE:
+            logger.warning(f"task failed {tid} :: {running[tid].task_name} [{running[tid].task.dt_from} - {running[tid].task.dt_to}]")
+        if shard_queue.finished(running[tid].task) and status == states.SUCCESS:
+            logger.info(f"range finished :: {running[tid].task_name}")
+        running.pop(tid)
+    running_state.remove(*finished)
+
+
+def _reclaim_lost(running: dict[str, RunningTask]) -> None:
+    """Revokes the tasks whose lease or pending deadline expired and puts their range back in front of the channel queue."""
+    lost = [tid for tid in running_state.expired() if tid in running]
+    for tid in lost:
+        logger.warning(f"task lost {tid} :: {running[tid].task_name}")
+        app.control.revoke(tid)
+        shard_queue.requeue(running[tid].task_name, running[tid].task)
+        running.pop(tid)
+    running_state.remove(*lost)
+
+
+def _shard_channels(task_names: list[str], running: dict[str, RunningTask], pending: dict[str, int], priority: Callable[[str], int]) -> None:
+    """Claims every queued range of `task_names` and pushes its shards at the priority of the channel, updating `pending`."""
+    for task_name, channel_tasks_claimed in claimer.claim(dict.fromkeys(task_names, CLAIM_ALL)).items():
+        # the shards already in flight are skipped just like the ranges scraped before
+        in_flight_ranges = [(as_utc(r.task.dt_from), as_utc(r.task.dt_to)) for r in running.values() if r.task_name == task_name]
+        for tsk in coalesce_tasks(channel_tasks_claimed):
+            covered = [*coverage.covered(task_name, tsk.dt_from, tsk.dt_to), *in_flight_ranges]
+            shards = split_task(tsk, covered)
+            if not shards:
+                logger.info(f"range already covered :: {task_name} [{tsk.dt_from} - {tsk.dt_to}]")
+            pending[task_name] = shard_queue.push(task_name, shards, priority(task_name))
+
+
+def _dispatch() -> None:
+    logger.debug(f"[{datetime.now()}] Manager is running")
 
+    running = running_state.items()
+    in_flight = len(running)
+    _forget_finished(running)
+    _reclaim_lost(running)
 
-def running_new_task_worker(tsk: Task):
+    running_per_channel = Counter(r.task_name for r in running.values())
 
-    global running_tasks
-    global running_channels
+    def capacity(task_name: str) -> int:
+        return max(0, settings.TASK_SHARDS_PER_CHANNEL - running_per_channel[task_name])
 
-    result = parse_api.delay(tsk.channel_name, tsk.model_dump_json(indent=4))
-    running_tasks[result.id] = result
-    running_channels[result.id] = tsk.channel_name
+    if scraper_breaker.is_open():
+        logger.warning(f"dispatch paused, scraper circuit breaker is open for {scraper_breaker.retry_after():.0f}s")
+        return
+
+    dead_channels = dead_letter.channels()
+    byte_tasks = rds.smembers(str(RedisTask.channel_tasks.value))
+    channel_tasks = {task.decode("utf-8") for task in byte_tasks} - dead_channels
+    pending = {task_name: count for task_name, count in shard_queue.pending().items() if task_name not in dead_channels}
+    waiting = any(capacity(task_name) > 0 for task_name in channel_tasks | pending.keys())
+    cow = concurrency.limit(running=in_flight, waiting=waiting)
+    free = cow - len(running)
+    if free <= 0:
+        return
 
-    return result
+    channel_priorities = priorities.all()
+
+    def priority(task_name: str) -> int:
+        return channel_priorities.get(task_name, DEFAULT_PRIORITY)
+
+    # shard the queued ranges, most urgent first, until there are enough shards for the free slots
+    candidates = sorted((task_name for task_name in channel_tasks if capacity(task_name) > 0), key=lambda task_name: (-priority(task_name), task_name))
+    # ranges queued with a priority above the shards waiting for their channel are sharded right away, in front of them
+    head_priorities = shard_queue.head_priorities(list(pending))
+    urgent = [task_name for task_name in candidates if task_name in head_priorities and priority(task_name) > head_priorities[task_name]]
+    _shard_channels(urgent, running, pending, priority)
+    candidates = [task_name for task_name in candidates if task_name not in urgent]
+    while candidates and sum(min(count, capacity(task_name)) for task_name, count in pending.items()) < free:
+        batch, candidates = candidates[:free], candidates[free:]
+        _shard_channels(batch, running, pending, priority)
+
+    available = {task_name: min(count, capacity(task_name)) for task_name, count in pending.items()}
+    shares = fair_share(available, running_per_channel, free, channel_priorities)
+    for task_name, shards in shard_queue.pop(shares).items():
+        for tsk in shards:
+            result = running_new_task_worker(task_name, tsk)
+            logger.debug(f"Running new task: {result.id} :: {task_name} [{tsk.dt_from} - {tsk.dt_to}]")
+
+
+def run_dispatcher() -> None:
+    """Long-running dispatcher: blocks on manager events and dispatches as soon as one arrives.
+
+    Events are pushed by the dashboard when a channel is queued and by parse_api when it finishes.
+    The wait is bounded by MANAGER_WAKEUP_TIMEOUT, so the dispatcher also ticks on its own when idle.
+    """
+    events_key = str(RedisTask.manager_events.value)
+    heartbeat_key = str(RedisTask.dispatcher_heartbeat.value)
+    while True:
+        try:
+            rds.set(heartbeat_key, datetime.now().isoformat(), ex=settings.MANAGER_HEARTBEAT_TTL)
+            event = rds.blpop([events_key], timeout=settings.MANAGER_WAKEUP_TIMEOUT)
+            if event is not None:
+                # a burst of events is served by a single round
+                rds.delete(events_key)
+                logger.debug(f"Manager woken up by {event[1].decode('utf-8')}")
+            dispatch()
+        except Exception:
+            # a failed round must not stop the dispatcher, the next one starts from the state in redis
+            logger.exception("dispatch round failed")
+            time.sleep(settings.MANAGER_WAKEUP_TIMEOUT)
 
 
 @app.task
 def manager_task():
-    global running_tasks
-    global running_channels
-
-    cow_redis = rds.get(str(RedisTask.counter_of_workers.value))
-    if isinstance(cow_redis.decode("utf-8"), str):
-        cow = int(cow_redis.decode("utf-8"))
-    else:
-        cow = 3
-    byte_tasks = rds.smembers(str(RedisTask.channel_tasks.value))
-    if not byte_tasks:
+    # safety net for beat: the dispatcher process does the work while it is alive
+    if rds.exists(str(RedisTask.dispatcher_heartbeat.value)):
         return
-    tasks = [task.decode("utf-8") for task in byte_tasks]
-    logger.debug(f"[{datetime.now()}] Manager is running")
+    dispatch()
 
-    finished = [tid for tid, r in running_tasks.items() if AsyncResult(tid).ready()]
-
-    for tid in finished:
-        logger.debug(f"task finished {tid}")
-        running_tasks.pop(tid)
-        channel_name = running_channels.pop(tid)
-        tsk = serialize_channel_task(channel_name)
-        if not tsk:
-            continue
-        result = running_new_task_worker(tsk)
-        logger.debug(f"Running new task: {result.id} :: {channel_name}")
-
-    for i in range(cow - len(running_tasks.items())):
-        for item in running_channels.items():
-            if not str(item) in tasks:
-                continue
-            tasks.remove(str(item))
-        if not tasks:
-            return
-        task = tasks.pop()
-        tsk = serialize_channel_task(task)
-        if not tsk:
-            continue
-        result = running_new_task_worker(tsk)
-        logger.debug(f"Running new task: {result.id} :: {task}")
 
+if __name__ == "__main__":
+    with log.scope(logger, "manager dispatcher"):
+        run_dispatcher()
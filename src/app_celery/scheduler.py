@@ -0,0 +1,65 @@
+from collections import Counter
+
+from redis import Redis
+
+from src.dto.redis_task import RedisTask
+from src.env import settings
+
+DEFAULT_PRIORITY = 1
+
+
+def source_of(task_name: str) -> str:
+    return task_name.split("$", maxsplit=1)[0]
+
+
+def fair_share(
+    available: dict[str, int],
+    running: Counter[str],
+    free: int,
+    priorities: dict[str, int] | None = None,
+) -> dict[str, int]:
+    """Hands out `free` slots across channel queues by weighted fair share.
+
+    Every slot goes first to the source, then to the channel of that source, with the least slots
+    per unit of weight, counting the tasks already running. Source weights and caps come from settings,
+    channel weights are their priorities. Ties go to the higher priority, then to the smaller backlog,
+    so urgent and small channels start first while big backfills keep progressing.
+    """
+    priorities = priorities or {}
+    shares: Counter[str] = Counter()
+    running_per_source = Counter(dict.fromkeys(map(source_of, available), 0))
+    for task_name, count in running.items():
+        running_per_source[source_of(task_name)] += count
+
+    def priority(task_name: str) -> int:
+        return max(1, priorities.get(task_name, DEFAULT_PRIORITY))
+
+    def source_has_room(source: str) -> bool:
+        limit = settings.SOURCE_CONCURRENCY_LIMITS.get(source)
+        return limit is None or running_per_source[source] < limit
+
+    for _ in range(free):
+        candidates = [name for name, count in available.items() if shares[name] < count and source_has_room(source_of(name))]
+        if not candidates:
+            break
+        source = min(
+            {source_of(name) for name in candidates},
+            key=lambda s: (running_per_source[s] / settings.SOURCE_WEIGHTS.get(s, 1), s),
+        )
+        task_name = min(
+            (name for name in candidates if source_of(name) == source),
+            key=lambda name: ((running[name] + shares[name]) / priority(name), -priority(name), available[name], name),
+        )
+        shares[task_name] += 1
+        running_per_source[source] += 1
+    return dict(shares)
+
+
+class ChannelPriorities:
+    """Scheduling weight of every channel queue, kept in the `channel_priorities` hash."""
+
+    def __init__(self, rds: Redis) -> None:
+        self._rds = rds
+
+    def all(self) -> dict[str, int]:
+        return {name.decode("utf-8"): int(value) for name, value in self._rds.hgetall(str(RedisTask.channel_priorities.value)).items()}
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import logging
+import math
+import sys
+from collections.abc import Iterable
+from itertools import batched
+
+from redis import Redis
+
+from src import log
+from src.app_api.dependencies import get_db_main_manager
+from src.db_main.cruds import channel_stats_crud, tg_post_crud
+from src.dto.redis_task import RedisTask
+from src.env import settings
+
+logger = logging.getLogger(__name__)
+
+_BATCH_SIZE = 1000  # post ids per BITFIELD command
+
+# KEYS[1] is the meta hash of a channel filter, ARGV is the number of ids to add and the capacity of a new first layer.
+# Counts the ids into the last layer, or opens a layer of twice the capacity once the last one is full.
+# Returns the number of layers and the capacity of the first one.
+_RESERVE_LUA = """
+local n = tonumber(ARGV[1])
+redis.call('HSETNX', KEYS[1], 'base', ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'base', 'layers', 'count')
+local base = tonumber(state[1])
+local layers = tonumber(state[2]) or 1
+local count = tonumber(state[3]) or 0
+if count > 0 and count + n > base * 2 ^ (layers - 1) then
+    layers = layers + 1
+    count = 0
+end
+redis.call('HSET', KEYS[1], 'layers', layers, 'count', count + n)
+return {layers, base}
+"""
+
+
+def bloom_size(capacity: int, fp_rate: float) -> tuple[int, int]:
+    """Bits and hash functions of a Bloom filter holding `capacity` items with the false positive rate `fp_rate`."""
+    bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+
+class SeenPosts:
+    """Scalable Bloom filter of the post ids already stored for every channel, a few redis bitmaps per channel.
+
+    A post the filter does not know is new for sure; a known one was stored, except for a
+    SEEN_POSTS_FP_RATE share of new posts that are taken for known ones. The filter of a channel
+    grows with it: once its last layer holds as many ids as it was sized for, a layer of twice the
+    capacity and half the false positive rate is added, so the rate stays under SEEN_POSTS_FP_RATE
+    whatever the size of the channel. `rebuild` sizes the first layer from the posts already stored;
+    run it after the FP rate setting changed (it is part of the key) or after tg_posts was restored,
+    with `python -m src.app_celery.seen_posts [channel ...]`.
+    """
+
+    def __init__(self, rds: Redis, capacity: int = settings.SEEN_POSTS_CAPACITY, fp_rate: float = settings.SEEN_POSTS_FP_RATE) -> None:
+        self._rds = rds
+        self._capacity = capacity
+        self._fp_rate = fp_rate
+        self._reserve = rds.register_script(_RESERVE_LUA)
+
+    def _key(self, channel_name: str) -> str:
+        return f"{RedisTask.seen_posts.value}:{self._fp_rate}:{channel_name}"
+
+    def _layer_size(self, base: int, layer: int) -> tuple[int, int]:
+        return bloom_size(base * 2**layer, self._fp_rate / 2 ** (layer + 1))
+
+    @staticmethod
+    def _offsets(post_id: int, bits: int, hashes: int) -> list[int]:
+        digest = hashlib.blake2b(str(post_id).encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8]), int.from_bytes(digest[8:]) | 1
+        return [(h1 + i * h2) % bits for i in range(hashes)]
+
+    def _add_to(self, key: str, size: tuple[int, int], post_ids: Iterable[int]) -> None:
+        for batch in batched(post_ids, _BATCH_SIZE):
+            bitfield = self._rds.bitfield(key)
+            for post_id in batch:
+                for offset in self._offsets(post_id, *size):
+                    bitfield.set("u1", offset, 1)
+            bitfield.execute()
+
+    def add(self, channel_name: str, post_ids: list[int]) -> None:
+        """Adds ids of posts that are stored. Ids added twice are counted twice and fill the filter sooner."""
+        if not post_ids:
+            return
+        key = self._key(channel_name)
+        layers, base = self._reserve(keys=[key], args=[len(post_ids), self._capacity])
+        self._add_to(f"{key}:{layers - 1}", self._layer_size(base, layers - 1), post_ids)
+
+    def known(self, channel_name: str, post_ids: list[int]) -> list[bool]:
+        key = self._key(channel_name)
+        base, layers = self._rds.hmget(key, "base", "layers")
+        known = [False] * len(post_ids)
+        if base is None:
+            return known
+        for layer in range(int(layers or 1)):
+            bits, hashes = self._layer_size(int(base), layer)
+            layer_known: list[bool] = []
+            for batch in batched(post_ids, _BATCH_SIZE):
+                bitfield = self._rds.bitfield(f"{key}:{layer}")
+                for post_id in batch:
+                    for offset in self._offsets(post_id, bits, hashes):
+                        bitfield.get("u1", offset)
+                values = bitfield.execute()
+                layer_known += [all(values[i : i + hashes]) for i in range(0, len(values), hashes)]
+            known = [was_known or is_known for was_known, is_known in zip(known, layer_known, strict=True)]
+        return known
+
+    def drop_known(self, posts: list[dict[str, str]]) -> list[dict[str, str]]:
+        """Drops the raw scraper posts whose channel already has their post_id. Malformed posts are kept for parse_data to report."""
+        by_channel: dict[str, list[tuple[int, dict[str, str]]]] = {}
+        unseen: list[dict[str, str]] = []
+        for post in posts:
+            try:
+                by_channel.setdefault(post["channel_name"], []).append((int(post["post_id"]), post))
+            except (KeyError, TypeError, ValueError):
+                unseen.append(post)
+        for channel_name, items in by_channel.items():
+            known = self.known(channel_name, [post_id for post_id, _ in items])
+            unseen += [post for (_, post), is_known in zip(items, known, strict=True) if not is_known]
+        return unseen
+
+    def rebuild(self, channel_name: str, post_ids: list[int]) -> None:
+        """Replaces the filter of a channel with a single layer of `post_ids`, sized for twice as many, built aside and swapped in at once."""
+        key = self._key(channel_name)
+        base = max(self._capacity, 2 * len(post_ids))
+        self._rds.delete(f"{key}:rebuild")
+        self._add_to(f"{key}:rebuild", self._layer_size(base, 0), post_ids)
+        layers = int(self._rds.hget(key, "layers") or 0)
+        pipe = self._rds.pipeline()
+        pipe.delete(key, *[f"{key}:{layer}" for layer in range(layers)])
+        if post_ids:
+            pipe.rename(f"{key}:rebuild", f"{key}:0")
+            pipe.hset(key, mapping={"base": base, "layers": 1, "count": len(post_ids)})
+        pipe.execute()
+
+
+async def rebuild_from_db(seen_posts: SeenPosts, channel_names: list[str]) -> None:
+    async with get_db_main_manager().session() as db:
+        if not channel_names:
+            channel_names = [stats.tg_channel_id for stats in await channel_stats_crud.get_channel_stats(db)]
+        for channel_name in channel_names:
+            post_ids = [post_id async for post_id in tg_post_crud.stream_tg_post_ids(db, channel_name)]
+            seen_posts.rebuild(channel_name, post_ids)
+            logger.info(f"seen posts filter rebuilt :: {channel_name} :: {len(post_ids)} posts")
+
+
+if __name__ == "__main__":
+    with log.scope(logger, "seen posts rebuild"):
+        asyncio.run(rebuild_from_db(SeenPosts(Redis()), sys.argv[1:]))
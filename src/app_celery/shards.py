@@ -0,0 +1,113 @@
+import math
+import uuid
+
+from redis import Redis
+
+from src.app_celery.scheduler import DEFAULT_PRIORITY
+from src.common.intervals import Interval, subtract_intervals
+from src.common.moment import Window, as_utc, split_period, utcnow
+from src.dto.redis_task import RedisTask, Task
+from src.env import settings
+
+
+def split_task(tsk: Task, covered: list[Interval] | None = None, window: Window = settings.TASK_SHARD_WINDOW) -> list[Task]:
+    """Splits the not yet `covered` parts of a queued range into calendar-aligned shards that share one group id.
+
+    The range is cut at the current moment, there is nothing to scrape in the future.
+    """
+    gaps = subtract_intervals((as_utc(tsk.dt_from), min(as_utc(tsk.dt_to), utcnow())), covered or [])
+    periods = [period for dt_from, dt_to in gaps for period in split_period(dt_from, dt_to, window)]
+    if len(periods) <= 1:
+        return [tsk.model_copy(update={"dt_from": dt_from, "dt_to": dt_to}) for dt_from, dt_to in periods]
+    group_id = str(uuid.uuid4())
+    return [tsk.model_copy(update={"dt_from": dt_from, "dt_to": dt_to, "group_id": group_id}) for dt_from, dt_to in periods]
+
+
+_PRIORITY_SCALE = 2**32  # scores of one priority level, the sequence of pushed shards wraps below it
+
+
+class ShardQueue:
+    """Shards of claimed ranges waiting for a free slot.
+
+    `task_shards:<source$channel>` is a sorted set of the shards of a channel queue in dispatch order:
+    higher priority first, then in the order they were pushed. `sharded_channels` holds the queues
+    that still have shards. `task_groups` counts the unfinished shards of every split range,
+    so the range is known to be complete once its last shard finishes.
+    """
+
+    def __init__(self, rds: Redis) -> None:
+        self._rds = rds
+        self._channels_key = str(RedisTask.sharded_channels.value)
+        self._groups_key = str(RedisTask.task_groups.value)
+        self._sequence_key = str(RedisTask.shard_sequence.value)
+
+    @staticmethod
+    def _key(task_name: str) -> str:
+        return f"{RedisTask.task_shards.value}:{task_name}"
+
+    def push(self, task_name: str, shards: list[Task], priority: int = DEFAULT_PRIORITY) -> int:
+        """Queues the shards of one range after the shards of the same or higher priority, returns how many shards the channel has waiting."""
+        if not shards:
+            return self._rds.zcard(self._key(task_name))
+        first = self._rds.incrby(self._sequence_key, len(shards)) - len(shards)
+        pipe = self._rds.pipeline()
+        pipe.zadd(
+            self._key(task_name), {shard.model_dump_json(): -priority * _PRIORITY_SCALE + (first + i) % _PRIORITY_SCALE for i, shard in enumerate(shards)}
+        )
+        pipe.zcard(self._key(task_name))
+        pipe.sadd(self._channels_key, task_name)
+        if shards[0].group_id is not None:
+            pipe.hset(self._groups_key, shards[0].group_id, len(shards))
+        return pipe.execute()[1]
+
+    def requeue(self, task_name: str, tsk: Task) -> None:
+        """Puts the shard of a lost task back to the head of its channel."""
+        head = self._rds.zrange(self._key(task_name), 0, 0, withscores=True)
+        score = -DEFAULT_PRIORITY * _PRIORITY_SCALE
+        if head:
+            # halfway to the start of the priority level of the head, so the shard keeps that priority
+            score = (head[0][1] + math.floor(head[0][1] / _PRIORITY_SCALE) * _PRIORITY_SCALE) / 2
+        pipe = self._rds.pipeline()
+        pipe.zadd(self._key(task_name), {tsk.model_dump_json(): score})
+        pipe.sadd(self._channels_key, task_name)
+        pipe.execute()
+
+    def pending(self) -> dict[str, int]:
+        task_names = sorted(name.decode("utf-8") for name in self._rds.smembers(self._channels_key))
+        pipe = self._rds.pipeline()
+        for task_name in task_names:
+            pipe.zcard(self._key(task_name))
+        return {task_name: count for task_name, count in zip(task_names, pipe.execute(), strict=True) if count > 0}
+
+    def head_priorities(self, task_names: list[str]) -> dict[str, int]:
+        """Priority of the next shard of every channel that has shards waiting."""
+        pipe = self._rds.pipeline()
+        for task_name in task_names:
+            pipe.zrange(self._key(task_name), 0, 0, withscores=True)
+        return {task_name: -math.floor(head[0][1] / _PRIORITY_SCALE) for task_name, head in zip(task_names, pipe.execute(), strict=True) if head}
+
+    def pop(self, counts: dict[str, int]) -> dict[str, list[Task]]:
+        task_names = list(counts)
+        pipe = self._rds.pipeline()
+        for task_name in task_names:
+            pipe.zpopmin(self._key(task_name), counts[task_name])
+            pipe.zcard(self._key(task_name))
+        results = pipe.execute()
+        shards: dict[str, list[Task]] = {}
+        drained: list[str] = []
+        for i, task_name in enumerate(task_names):
+            shards[task_name] = [Task.model_validate_json(raw) for raw, _ in results[2 * i]]
+            if results[2 * i + 1] == 0:
+                drained.append(task_name)
+        if drained:
+            self._rds.srem(self._channels_key, *drained)
+        return shards
+
+    def finished(self, tsk: Task) -> bool:
+        """Marks a shard as finished. Returns True once every shard of its range is done."""
+        if tsk.group_id is None:
+            return True
+        if self._rds.hincrby(self._groups_key, tsk.group_id, -1) > 0:
+            return False
+        self._rds.hdel(self._groups_key, tsk.group_id)
+        return True
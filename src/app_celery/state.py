@@ -0,0 +1,113 @@
+import contextlib
+import logging
+import threading
+import time
+from collections.abc import Iterator
+
+from redis import Redis
+
+from src.dto.redis_task import RedisTask, RunningTask, Task
+from src.env import settings
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] is the running_tasks hash, KEYS[2] the running_leases set, KEYS[3] the pending_tasks set.
+# ARGV is the task id and the lease expiry.
+# The lease is only started while the task is still recorded, so a reclaimed task does not come back.
+_START_LEASE_LUA = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+
+
+class RunningState:
+    """Tasks dispatched by the manager, shared through redis by every manager process.
+
+    `running_tasks` maps a celery task id to its RunningTask. A task waiting in the broker is in
+    `pending_tasks`, scored by the deadline TASK_PENDING_TTL after its dispatch or retry: past it,
+    the task is taken for lost before it started (dispatcher crash, message lost with a worker).
+    Once a worker picks it up, it moves to `running_leases`, scored by lease expiry and extended
+    while it runs, so an expired lease means the task was lost together with its worker.
+    """
+
+    def __init__(self, rds: Redis) -> None:
+        self._rds = rds
+        self._tasks_key = str(RedisTask.running_tasks.value)
+        self._leases_key = str(RedisTask.running_leases.value)
+        self._pending_key = str(RedisTask.pending_tasks.value)
+        self._start_lease = rds.register_script(_START_LEASE_LUA)
+
+    def add(self, task_id: str, task_name: str, tsk: Task) -> None:
+        pipe = self._rds.pipeline()
+        pipe.hset(self._tasks_key, task_id, RunningTask(task_name=task_name, task=tsk).model_dump_json())
+        pipe.zadd(self._pending_key, {task_id: time.time() + settings.TASK_PENDING_TTL})
+        pipe.execute()
+
+    def remove(self, *task_ids: str) -> None:
+        if not task_ids:
+            return
+        pipe = self._rds.pipeline()
+        pipe.hdel(self._tasks_key, *task_ids)
+        pipe.zrem(self._leases_key, *task_ids)
+        pipe.zrem(self._pending_key, *task_ids)
+        pipe.execute()
+
+    def start(self, task_id: str) -> bool:
+        """Starts the lease of a task picked up by a worker. Returns False if the manager already reclaimed it."""
+        keys = [self._tasks_key, self._leases_key, self._pending_key]
+        return bool(self._start_lease(keys=keys, args=[task_id, time.time() + settings.TASK_LEASE_TTL]))
+
+    def heartbeat(self, task_id: str) -> bool:
+        """Extends the lease of a running task. Returns False if the manager already reclaimed it."""
+        pipe = self._rds.pipeline()
+        pipe.zadd(self._leases_key, {task_id: time.time() + settings.TASK_LEASE_TTL}, xx=True)
+        pipe.zscore(self._leases_key, task_id)
+        return pipe.execute()[1] is not None
+
+    def release(self, task_id: str, countdown: float) -> None:
+        """Moves a task that goes back to the broker for a retry in `countdown` seconds from its lease to a pending deadline."""
+        pipe = self._rds.pipeline()
+        pipe.zrem(self._leases_key, task_id)
+        pipe.zadd(self._pending_key, {task_id: time.time() + countdown + settings.TASK_PENDING_TTL})
+        pipe.execute()
+
+    def items(self) -> dict[str, RunningTask]:
+        raw = self._rds.hgetall(self._tasks_key)
+        return {tid.decode("utf-8"): RunningTask.model_validate_json(value) for tid, value in raw.items()}
+
+    def expired(self) -> list[str]:
+        """Tasks whose lease expired or that were not picked up before their pending deadline."""
+        now = time.time()
+        pipe = self._rds.pipeline()
+        pipe.zrangebyscore(self._leases_key, "-inf", now)
+        pipe.zrangebyscore(self._pending_key, "-inf", now)
+        return [tid.decode("utf-8") for ids in pipe.execute() for tid in ids]
+
+    @contextlib.contextmanager
+    def keep_alive(self, task_id: str) -> Iterator[bool]:
+        """Heartbeats the lease of `task_id` from a background thread while the block runs.
+
+        Yields False, without heartbeats, if the task was already reclaimed: the block must not run it then.
+        """
+        if not self.start(task_id):
+            logger.warning(f"task {task_id} was already reclaimed")
+            yield False
+            return
+        stop = threading.Event()
+
+        def _beat() -> None:
+            while not stop.wait(settings.TASK_LEASE_TTL / 3):
+                if not self.heartbeat(task_id):
+                    logger.warning(f"lease of task {task_id} was lost")
+
+        thread = threading.Thread(target=_beat, name=f"lease-{task_id}", daemon=True)
+        thread.start()
+        try:
+            yield True
+        finally:
+            stop.set()
+            thread.join()
@@ -1,46 +1,98 @@
-import asyncio
+import fcntl
 import json
 import logging
+import time
+import uuid
+from collections.abc import AsyncIterator
 from datetime import datetime
 from pathlib import Path
+from typing import Any, NoReturn, TypedDict
 
 import httpx
-from pydantic import HttpUrl, BaseModel
+from celery import Task as CeleryTask
+from celery.signals import task_postrun
+from pydantic import HttpUrl, TypeAdapter, ValidationError
+from redis import Redis
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
-from src.app_api.dependencies import get_db_main_manager, get_db_main
+from src.app_celery.checkpoints import Checkpoint, Checkpoints, advance, resume_task
+from src.app_celery.concurrency import is_overload, record_scraper_call
+from src.app_celery.coverage import CoverageIndex
+from src.app_celery.limiter import CircuitBreaker, DeadLetter, TokenBucket, retry_delay
 from src.app_celery.main import app
-from src.common.async_utils import run_on_loop
+from src.app_celery.seen_posts import SeenPosts
+from src.app_celery.state import RunningState
+from src.app_celery.worker_runtime import worker_runtime
+from src.common.json_stream import TruncatedJsonError, iter_json_array, iter_ndjson
 from src.db_main.cruds import tg_post_crud
-from src.dto.redis_task import Task
-from src.dto.post import Post
-from src.env import SCRAPPER_RESULTS_DIR__TELEGRAM
+from src.db_main.pool_metrics import publish_pool_metrics
+from src.dto.redis_task import ManagerEvent, RedisTask, Task
+from src.dto.post import PostRecord
+from src.env import SCRAPPER_RESULTS_DIR__TELEGRAM, settings
+from src.errors import ScrapperError
 
 logger = logging.getLogger(__name__)
 
-class InvalidDataException(Exception):
-    pass
+rds = Redis()
+running_state = RunningState(rds)
+coverage = CoverageIndex(rds)
+scraper_limiter = TokenBucket(rds, settings.SCRAPER_URL)
+scraper_breaker = CircuitBreaker(rds, settings.SCRAPER_URL)
+dead_letter = DeadLetter(rds)
+seen_posts = SeenPosts(rds)
+checkpoints = Checkpoints(rds)
 
 
-class TmpListTgPost(BaseModel):
-    posts: list[Post]
+class _RawPost(TypedDict):
+    channel_name: str
+    post_id: int
+    content: str
+    pb_date: datetime
+    link: HttpUrl
+    media: dict[str, str] | None
 
 
-def parse_data(channel_name: str, posts: list[dict[str, str]]) -> list[Post]:
-    tg_posts: list[Post] = []
+class _ArchivedPost(TypedDict):
+    channel_name: str
+    post_id: int
+    content: str
+    pb_date: datetime
+    link: str
+    media: dict[str, str] | None
+
+
+class _ArchiveFile(TypedDict):
+    posts: list[_ArchivedPost]
+
+
+_archive_adapter = TypeAdapter(_ArchiveFile)
+
+
+_raw_posts_adapter = TypeAdapter(list[_RawPost])
+
+
+def _to_records(posts: list[_RawPost]) -> list[PostRecord]:
+    return [PostRecord(post["channel_name"], post["post_id"], post["content"], post["pb_date"], str(post["link"]), post["media"]) for post in posts]
+
+
+def parse_data(channel_name: str, posts: list[dict[str, str]]) -> list[PostRecord]:
+    """Validates raw scraper posts in one pydantic pass over the whole batch, into compact records.
+
+    Invalid posts are reported and dropped, the rest of the batch is still returned.
+    """
     try:
-        for post in posts:
-            tg_posts.append(Post(channel_name=post['channel_name'],
-                                 post_id=int(post['post_id']),
-                                 content=post['content'],
-                                 pb_date=datetime.fromisoformat(post['pb_date']),
-                                 link=HttpUrl(post['link']),
-                                 media=post['media']))
-    except InvalidDataException as e:
-        logger.warning(f'CELERY WORKER :: invalid response data for channel -- {channel_name} -- {e}')
-    return tg_posts
-
-
-def heapify(arr: list[Post], n: int, i: int):
+        return _to_records(_raw_posts_adapter.validate_python(posts))
+    except ValidationError as e:
+        errors: dict[int, list[str]] = {}
+        for error in e.errors():
+            errors.setdefault(int(error["loc"][0]), []).append(f"{'.'.join(map(str, error['loc'][1:]))}: {error['msg']}")
+        for index, messages in errors.items():
+            post_id = posts[index].get("post_id") if isinstance(posts[index], dict) else None
+            logger.warning(f"CELERY WORKER :: invalid post {post_id} for channel -- {channel_name} -- {'; '.join(messages)}")
+        return _to_records(_raw_posts_adapter.validate_python([post for index, post in enumerate(posts) if index not in errors]))
+
+
+def heapify(arr: list[PostRecord], n: int, i: int):
     largest = i # Initialize largest as root
     l = 2 * i + 1   # left = 2*i + 1
     r = 2 * i + 2   # right = 2*i + 2
@@ -64,7 +116,7 @@ def heapify(arr: list[Post], n: int, i: int):
 
 
 # Основная функция для сортировки массива заданного размера
-def heap_sort(arr: list[Post]):
+def heap_sort(arr: list[PostRecord]):
     n = len(arr)
 
     # Построение max-heap.
@@ -77,33 +129,37 @@ def heap_sort(arr: list[Post]):
         heapify(arr, i, 0)
 
 
-def _save_to_file(tmp_post, tmp_posts):
-    tmp = ""
-    scrapper_path: Path = (SCRAPPER_RESULTS_DIR__TELEGRAM / tmp_post.channel_tasks / f"{tmp_post.pb_date.year}")
-    if (scrapper_path / f"{tmp_post.channel_tasks}__{tmp_post.pb_date.month}.json").exists():
-        text = json.load((scrapper_path / f"{tmp_post.channel_tasks}__{tmp_post.pb_date.month}.json").open())
-        text_posts = text["posts"]
-        if isinstance(text_posts, list):
-            for i, post in enumerate(parse_data(tmp_post.channel_tasks, text_posts)):
-                tmp_posts.insert(i, post)
-            tmp = "TMP"
+def _save_to_file(tmp_post: PostRecord, tmp_posts: list[PostRecord]) -> None:
+    scrapper_path: Path = SCRAPPER_RESULTS_DIR__TELEGRAM / tmp_post.channel_name / f"{tmp_post.pb_date.year}"
+    month_file = scrapper_path / f"{tmp_post.channel_name}__{tmp_post.pb_date.month}.json"
     scrapper_path.mkdir(parents=True, exist_ok=True)
-    (scrapper_path / f"{tmp}{tmp_post.channel_tasks}__{tmp_post.pb_date.month}.json").write_text(
-        TmpListTgPost(posts=tmp_posts).model_dump_json(indent=4))
-    if tmp == "TMP":
-        (scrapper_path / f"{tmp_post.channel_tasks}__{tmp_post.pb_date.month}.json").rename(
-            (scrapper_path / f"{tmp}{tmp_post.channel_tasks}__{tmp_post.pb_date.month}.json"))
+    # shards of one month may be scraped at the same time, each merge must see the posts of the previous one
+    with (scrapper_path / f".{month_file.name}.lock").open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if month_file.exists():
+            text = json.loads(month_file.read_text())
+            text_posts = text["posts"]
+            if isinstance(text_posts, list):
+                archived = parse_data(tmp_post.channel_name, text_posts)
+                # a batch scraped again after a crash is archived again, its posts are kept once
+                archived_ids = {post.post_id for post in archived}
+                tmp_posts[:] = [*archived, *(post for post in tmp_posts if post.post_id not in archived_ids)]
+        tmp_file = scrapper_path / f"TMP{uuid.uuid4().hex}{month_file.name}"
+        tmp_file.write_text(_archive_adapter.dump_json({"posts": [post.to_dict() for post in tmp_posts]}, indent=4).decode("utf-8"))
+        # the merged file replaces the month file at once, an interrupted save leaves the previous one
+        tmp_file.replace(month_file)
 
-def save_to_telegram_file(posts: list[Post]) -> None:
+
+def save_to_telegram_file(posts: list[PostRecord]) -> None:
     heap_sort(posts)
-    tmp_posts: list[Post] = []
+    tmp_posts: list[PostRecord] = []
     for post in posts:
         try:
             tmp_post = tmp_posts[-1]
         except IndexError:
             tmp_posts.append(post)
             continue
-        if tmp_post.pb_date.month == post.pb_date.month:
+        if (tmp_post.pb_date.year, tmp_post.pb_date.month) == (post.pb_date.year, post.pb_date.month):
             tmp_posts.append(post)
             continue
         else:
@@ -119,22 +175,167 @@ def save_to_telegram_file(posts: list[Post]) -> None:
 
 
 
-@app.task(bind=True)
-def parse_api(self, channel_name, task) -> None:
-    with httpx.Client() as client:
-        response = client.post(f"http://localhost:50001/start", data=task, timeout=10000)
-        logger.debug(response.status_code)
-        if response.status_code != 200:
-            return
-    text = response.json()
-    if not isinstance(text, list):
-        logger.debug(f"noooooooooooooooooooooooooooooooooooo -- {text}")
-        return
-    tg_posts = parse_data(channel_name, text)
-    db = run_on_loop(get_db_main())
-    posts = run_on_loop(tg_post_crud.create_tg_posts(db, tg_posts))
-    save_to_telegram_file(posts)
+def _retry_later(task: CeleryTask, channel_name: str, task_json: str, attempt: int, countdown: float) -> NoReturn:
+    # the task waits in the broker under a pending deadline, the worker that picks the retry up starts a new lease
+    running_state.release(task.request.id, countdown)
+    raise task.retry(args=(channel_name, task_json), kwargs={"attempt": attempt}, countdown=countdown)
+
+
+def _fail_scraper_call(task: CeleryTask, channel_name: str, task_json: str, attempt: int) -> NoReturn:
+    tsk = Task.model_validate_json(task_json)
+    if attempt < settings.SCRAPER_MAX_RETRIES:
+        _retry_later(task, channel_name, task_json, attempt + 1, retry_delay(attempt))
+    dead_letter.record_failure(f"{tsk.source}${tsk.channel_name}", task_json)
+    # the task must end as FAILURE, so the manager does not take the range for scraped
+    raise ScrapperError(f"scraper call failed after {attempt} retries -- {channel_name}")
+
+
+def _post_ids_by_channel(tg_posts: list[PostRecord]) -> dict[str, list[int]]:
+    post_ids: dict[str, list[int]] = {}
+    for tg_post in tg_posts:
+        post_ids.setdefault(tg_post.channel_name, []).append(tg_post.post_id)
+    return post_ids
+
 
+class _ScraperStream:
+    """The /start response of the scraper, read batch by batch from the task thread as it arrives.
 
+    The scraper may answer with NDJSON or a JSON array, both are decoded incrementally.
+    """
+
+    def __init__(self, task_json: str) -> None:
+        self._task_json = task_json
+        self._response: httpx.Response | None = None
+        self._items: AsyncIterator[Any] | None = None
+        self.received = 0
+
+    async def open(self) -> int:
+        """Sends the request and returns the status code once the headers are received."""
+        client = worker_runtime.http_client
+        request = client.build_request("POST", f"{settings.SCRAPER_URL}/start", content=self._task_json, timeout=10000)
+        self._response = await client.send(request, stream=True)
+        if self._response.headers.get("content-type", "").startswith(("application/x-ndjson", "application/jsonl")):
+            self._items = iter_ndjson(self._response.aiter_text())
+        else:
+            self._items = iter_json_array(self._response.aiter_text())
+        return self._response.status_code
+
+    async def next_batch(self) -> list[dict[str, str]]:
+        """Up to INGEST_BATCH_SIZE posts, an empty list once the response is over."""
+        assert self._items is not None
+        batch: list[dict[str, str]] = []
+        async for item in self._items:
+            batch.append(item)
+            if len(batch) >= settings.INGEST_BATCH_SIZE:
+                break
+        self.received += len(batch)
+        return batch
+
+    async def close(self) -> None:
+        if self._response is not None:
+            await self._response.aclose()
+
+
+async def _store_posts(tg_posts: list[PostRecord]) -> list[PostRecord]:
+    # the engine is shared by every task of the worker process, the session only borrows a pooled connection
+    db_manager = worker_runtime.db
+    async with db_manager.session() as db:
+        return await tg_post_crud.bulk_create_tg_posts(db, tg_posts)
+
+
+def _ingest_batch(channel_name: str, batch: list[dict[str, str]]) -> list[PostRecord]:
+    """Validates, stores and archives the posts of one batch that are not known yet. Returns the new ones."""
+    unseen = seen_posts.drop_known(batch)
+    tg_posts = parse_data(channel_name, unseen)
+    posts = worker_runtime.run(_store_posts(tg_posts))
+    # the sync redis client blocks, it is used from the task thread and never on the shared loop
+    publish_pool_metrics(rds, worker_runtime.db.pool_metrics())
+    # archived before the filter learns them: after a crash in between, the retry archives them again, not never
+    save_to_telegram_file(tg_posts)
+    # every post that reached the insert is stored now, the ones that hit ON CONFLICT were stored before without
+    # the filter knowing them (it would have dropped them), so channels stored earlier learn their posts too
+    for post_channel_name, post_ids in _post_ids_by_channel(tg_posts).items():
+        seen_posts.add(post_channel_name, post_ids)
+    return posts
+
+
+def _ingest_stream(channel_name: str, tsk: Task, checkpoint: Checkpoint | None, stream: _ScraperStream) -> int:
+    """Ingests the response batch by batch, checkpointing each one once it is stored and archived. Returns the new post count."""
+    new = 0
+    while batch := worker_runtime.run(stream.next_batch()):
+        new += len(_ingest_batch(channel_name, batch))
+        if (checkpoint := advance(checkpoint, batch)) is not None:
+            checkpoints.save(tsk, checkpoint)
+    return new
+
+
+def _open_stream(task: CeleryTask, channel_name: str, task_json: str, attempt: int, tsk: Task, stream: _ScraperStream) -> None:
+    """Sends the scraper request and checks its status, a failed call is retried or ends the task."""
+    started_at = time.monotonic()
+    try:
+        status_code = worker_runtime.run(stream.open())
+    except httpx.HTTPError as e:
+        logger.warning(f"scraper request failed -- {channel_name} -- {e}")
+        record_scraper_call(rds, 0, time.monotonic() - started_at)
+        scraper_breaker.record_failure()
+        _fail_scraper_call(task, channel_name, task_json, attempt)
+    # open returns with the headers, so the latency does not grow with the size of the range
+    record_scraper_call(rds, status_code, time.monotonic() - started_at)
+    logger.debug(status_code)
+    if is_overload(status_code):
+        scraper_breaker.record_failure()
+        _fail_scraper_call(task, channel_name, task_json, attempt)
+    if status_code != 200:
+        # the scraper is fine but refuses this channel, retrying will not help
+        dead_letter.record_failure(f"{tsk.source}${tsk.channel_name}", task_json)
+        raise ScrapperError(f"scraper refused the task with {status_code} -- {channel_name}")
+    scraper_breaker.record_success()
+
+
+@app.task(bind=True, max_retries=None)
+def parse_api(self, channel_name, task, attempt: int = 0) -> None:
+    with running_state.keep_alive(self.request.id) as leased:
+        if not leased:
+            # the manager gave the shard to another task, scraping it here would ingest and archive it twice
+            return
+        if scraper_breaker.is_open():
+            # waiting for the scraper to recover does not use up the retries of the task
+            _retry_later(self, channel_name, task, attempt, scraper_breaker.retry_after())
+        scraper_limiter.acquire()
+        tsk = Task.model_validate_json(task)
+        checkpoint = checkpoints.get(tsk)
+        if checkpoint is not None:
+            logger.info(f"resuming after {checkpoint.posts} posts, at {checkpoint.last_pb_date} / {checkpoint.last_post_id} -- {channel_name}")
+            stream = _ScraperStream(resume_task(tsk, checkpoint).model_dump_json(indent=4, exclude={"group_id"}))
+        else:
+            stream = _ScraperStream(task)
+        try:
+            _open_stream(self, channel_name, task, attempt, tsk, stream)
+            try:
+                new = _ingest_stream(channel_name, tsk, checkpoint, stream)
+            except PoolTimeoutError as e:
+                # the database is busy, not the scraper: the retry resumes from the checkpoint and keeps its attempts
+                logger.warning(f"no database connection after {stream.received} posts -- {channel_name} -- {e}")
+                _retry_later(self, channel_name, task, attempt, settings.SCRAPER_RETRY_DELAY)
+            except (httpx.HTTPError, TruncatedJsonError) as e:
+                # the retry resumes from the checkpoint of the last stored batch
+                logger.warning(f"scraper stream broke after {stream.received} posts -- {channel_name} -- {e}")
+                scraper_breaker.record_failure()
+                _fail_scraper_call(self, channel_name, task, attempt)
+            except ValueError as e:
+                # a malformed response comes back the same on a retry
+                logger.warning(f"invalid scraper response after {stream.received} posts -- {channel_name} -- {e}")
+                dead_letter.record_failure(f"{tsk.source}${tsk.channel_name}", task)
+                raise ScrapperError(f"invalid scraper response -- {channel_name}") from e
+        finally:
+            worker_runtime.run(stream.close())
+        logger.info(f"{new} new of {stream.received} scraped posts -- {channel_name}")
+        coverage.add(f"{tsk.source}${tsk.channel_name}", tsk.dt_from, tsk.dt_to)
+        checkpoints.clear(tsk)
+        dead_letter.record_success(f"{tsk.source}${tsk.channel_name}")
 
 
+@task_postrun.connect(sender=parse_api)
+def notify_manager_on_finish(task_id: str, **kwargs: object) -> None:
+    # wake up the dispatcher so the freed slot is refilled right away
+    rds.rpush(str(RedisTask.manager_events.value), ManagerEvent.finished.value)
@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+
+from src.app_celery.checkpoints import advance, resume_task
+from src.dto.redis_task import Task
+
+
+def _post(post_id: int, day: int) -> dict[str, str]:
+    return {"post_id": str(post_id), "pb_date": datetime(2024, 1, day, tzinfo=timezone.utc).isoformat()}
+
+
+def _dt(day: int) -> datetime:
+    return datetime(2024, 1, day, tzinfo=timezone.utc)
+
+
+def test_resume_task() -> None:
+    tsk = Task(source="telegram", channel_name="c", dt_from=_dt(1), dt_to=_dt(31))
+
+    oldest_first = advance(advance(None, [_post(1, 2), _post(2, 3)]), [{"post_id": "x"}, _post(3, 5)])
+    assert oldest_first is not None
+    assert (oldest_first.last_post_id, oldest_first.posts) == (3, 3)
+    assert (resume_task(tsk, oldest_first).dt_from, resume_task(tsk, oldest_first).dt_to) == (_dt(5), _dt(31))
+
+    newest_first = advance(None, [_post(9, 30), _post(8, 20)])
+    assert newest_first is not None
+    assert (resume_task(tsk, newest_first).dt_from, resume_task(tsk, newest_first).dt_to) == (_dt(1), _dt(20))
+
+    single = advance(None, [_post(9, 30)])
+    assert single is not None
+    assert resume_task(tsk, single) == tsk
+    assert advance(None, []) is None
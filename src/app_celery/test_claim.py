@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+import fakeredis
+
+from src.app_celery.claim import CLAIM_ALL, ChannelTaskClaimer
+from src.dto.redis_task import RedisTask
+
+_CHANNEL_TASKS = str(RedisTask.channel_tasks.value)
+
+
+def _bounds(*days: int) -> list[str]:
+    return [datetime(2024, 1, day, tzinfo=timezone.utc).isoformat() for day in days]
+
+
+def test_claim() -> None:
+    rds = fakeredis.FakeRedis()
+    claimer = ChannelTaskClaimer(rds)
+    rds.rpush("telegram$a", *_bounds(1, 2, 3, 4, 5, 6))
+    rds.rpush("telegram$b", *_bounds(1, 2))
+    rds.rpush("telegram$odd", *_bounds(1, 2, 3))
+    rds.sadd(_CHANNEL_TASKS, "telegram$a", "telegram$b", "telegram$odd")
+
+    claimed = claimer.claim({"telegram$a": 2, "telegram$b": 0, "telegram$odd": CLAIM_ALL})
+    assert [(tsk.dt_from.day, tsk.dt_to.day) for tsk in claimed["telegram$a"]] == [(1, 2), (3, 4)]
+    assert claimed["telegram$b"] == []
+    assert [(tsk.dt_from.day, tsk.dt_to.day) for tsk in claimed["telegram$odd"]] == [(1, 2)]
+    # a queue left untouched keeps its ranges, the bound without a pair does not keep its queue alive
+    assert rds.llen("telegram$b") == 2
+    assert not rds.exists("telegram$odd")
+    assert rds.smembers(_CHANNEL_TASKS) == {b"telegram$a", b"telegram$b"}
+
+    claimed = claimer.claim({"telegram$a": CLAIM_ALL, "telegram$b": CLAIM_ALL})
+    assert [(tsk.dt_from.day, tsk.dt_to.day) for tsk in claimed["telegram$a"]] == [(5, 6)]
+    assert [(tsk.dt_from.day, tsk.dt_to.day) for tsk in claimed["telegram$b"]] == [(1, 2)]
+    assert rds.smembers(_CHANNEL_TASKS) == set()
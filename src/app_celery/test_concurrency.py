@@ -0,0 +1,18 @@
+from src.app_celery.concurrency import ScraperCallSample, aimd_step
+from src.env import settings
+
+
+def _samples(*status_codes: int, latency: float = 1.0) -> list[ScraperCallSample]:
+    return [ScraperCallSample(status_code=code, latency=latency) for code in status_codes]
+
+
+def test_aimd_step() -> None:
+    assert aimd_step(4, [], saturated=True) == 4
+    assert aimd_step(4, _samples(200, 200), saturated=True) == 5
+    assert aimd_step(4, _samples(200, 200), saturated=False) == 4
+    assert aimd_step(4, _samples(200, 429), saturated=True) == 2
+    assert aimd_step(4, _samples(200, 502), saturated=True) == 2
+    assert aimd_step(4, _samples(0), saturated=True) == 2
+    assert aimd_step(4, _samples(200, latency=settings.CONCURRENCY_LATENCY_TARGET + 1), saturated=True) == 2
+    assert aimd_step(settings.CONCURRENCY_MIN, _samples(503), saturated=True) == settings.CONCURRENCY_MIN
+    assert aimd_step(settings.concurrency_max, _samples(200), saturated=True) == settings.concurrency_max
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+import fakeredis
+import pytest
+
+from src.app_celery import limiter
+from src.app_celery.limiter import CircuitBreaker, DeadLetter, TokenBucket
+from src.dto.redis_task import Task
+from src.env import settings
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(limiter.time, "time", clock)
+    return clock
+
+
+def test_token_bucket(clock: _Clock) -> None:
+    bucket = TokenBucket(fakeredis.FakeRedis(), "scraper", rate=2.0, burst=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.try_acquire() == 0
+    clock.now += 60
+    assert [bucket.try_acquire() for _ in range(4)][-1] == pytest.approx(0.5)
+
+
+def test_circuit_breaker(clock: _Clock, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "SCRAPER_BREAKER_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "SCRAPER_BREAKER_COOLDOWN", 10)
+    breaker = CircuitBreaker(fakeredis.FakeRedis(), "scraper")
+    breaker.record_failure()
+    assert not breaker.is_open()
+    breaker.record_failure()
+    assert breaker.retry_after() == pytest.approx(10)
+    # failures while open do not extend the cool-down
+    breaker.record_failure()
+    assert breaker.retry_after() == pytest.approx(10)
+
+    clock.now += 10
+    assert not breaker.is_open()
+    breaker.record_failure()
+    assert breaker.retry_after() == pytest.approx(20)
+
+    clock.now += 20
+    breaker.record_success()
+    breaker.record_failure()
+    assert not breaker.is_open()
+
+
+def test_dead_letter(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "DEAD_LETTER_AFTER", 2)
+    dead_letter = DeadLetter(fakeredis.FakeRedis())
+    tsk = Task(source="telegram", channel_name="c", dt_from=datetime(2024, 1, 1, tzinfo=timezone.utc), dt_to=datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+    assert not dead_letter.record_failure("telegram$c", tsk.model_dump_json())
+    dead_letter.record_success("telegram$c")
+    assert not dead_letter.record_failure("telegram$c", tsk.model_dump_json())
+    assert dead_letter.record_failure("telegram$c", tsk.model_dump_json())
+    assert dead_letter.channels() == {"telegram$c"}
+    assert dead_letter.failed_tasks("telegram$c") == [tsk, tsk, tsk]
+
+    assert dead_letter.release("telegram$c") == [tsk, tsk, tsk]
+    assert dead_letter.channels() == set()
+    assert dead_letter.failed_tasks("telegram$c") == []
+    assert not dead_letter.record_failure("telegram$c", tsk.model_dump_json())
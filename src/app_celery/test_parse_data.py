@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from pydantic import HttpUrl
+
+from src.app_celery.tasks import parse_data
+from src.dto.post import Post
+
+
+def _raw(post_id: str, pb_date: str = "2024-01-01T10:00:00+03:00", link: str = "https://t.me/c/1") -> dict[str, str]:
+    return {"channel_name": "c", "post_id": post_id, "content": "text", "pb_date": pb_date, "link": link, "media": None}  # type: ignore[dict-item]
+
+
+def test_parse_data() -> None:
+    posts = parse_data("c", [_raw("1"), _raw("x"), _raw("3", pb_date="yesterday"), _raw("4", link="not a url"), _raw("5")])
+
+    assert [post.post_id for post in posts] == [1, 5]
+    assert posts[0].to_post() == Post(
+        channel_name="c",
+        post_id=1,
+        content="text",
+        pb_date=datetime.fromisoformat("2024-01-01T10:00:00+03:00"),
+        link=HttpUrl("https://t.me/c/1"),
+        media=None,
+    )
+    assert parse_data("c", []) == []
@@ -0,0 +1,40 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from src.app_celery import tasks
+from src.app_celery.tasks import save_to_telegram_file
+from src.dto.post import PostRecord
+
+
+def _post(post_id: int, pb_date: datetime = datetime(2024, 1, 10, tzinfo=timezone.utc)) -> PostRecord:
+    return PostRecord("c", post_id, "text", pb_date.replace(day=post_id % 28 + 1), f"https://t.me/c/{post_id}")
+
+
+def _archived(path: Path) -> list[int]:
+    return [post["post_id"] for post in json.loads(path.read_text())["posts"]]
+
+
+def test_save_to_telegram_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tasks, "SCRAPPER_RESULTS_DIR__TELEGRAM", tmp_path)
+
+    save_to_telegram_file([_post(2), _post(1)])
+    save_to_telegram_file([_post(3), _post(4)])
+    save_to_telegram_file([_post(5), _post(6, datetime(2025, 1, 1, tzinfo=timezone.utc))])
+    save_to_telegram_file([_post(4), _post(5)])
+
+    assert sorted(path.relative_to(tmp_path).as_posix() for path in tmp_path.rglob("*.json")) == ["c/2024/c__1.json", "c/2025/c__1.json"]
+    assert _archived(tmp_path / "c" / "2024" / "c__1.json") == [1, 2, 3, 4, 5]
+    assert _archived(tmp_path / "c" / "2025" / "c__1.json") == [6]
+
+
+def test_save_to_telegram_file_concurrently(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tasks, "SCRAPPER_RESULTS_DIR__TELEGRAM", tmp_path)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda post_id: save_to_telegram_file([_post(post_id)]), range(1, 25)))
+
+    assert sorted(_archived(tmp_path / "c" / "2024" / "c__1.json")) == list(range(1, 25))
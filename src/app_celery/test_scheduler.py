@@ -0,0 +1,22 @@
+from collections import Counter
+
+import pytest
+
+from src.app_celery.scheduler import fair_share
+from src.env import settings
+
+
+def test_fair_share() -> None:
+    assert fair_share({}, Counter(), 3) == {}
+    assert fair_share({"telegram$a": 5, "telegram$b": 1}, Counter(), 0) == {}
+    # a small channel is not starved by a big backfill
+    assert fair_share({"telegram$big": 10, "telegram$small": 1}, Counter({"telegram$big": 4}), 2) == {"telegram$small": 1, "telegram$big": 1}
+    # an urgent channel goes first and gets the bigger share
+    assert fair_share({"telegram$a": 10, "telegram$b": 10}, Counter(), 4, {"telegram$b": 3}) == {"telegram$b": 3, "telegram$a": 1}
+    # sources share the slots before their channels do
+    assert fair_share({"telegram$a": 5, "telegram$b": 5, "youtube$c": 5}, Counter(), 4) == {"telegram$a": 1, "telegram$b": 1, "youtube$c": 2}
+
+
+def test_fair_share_source_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "SOURCE_CONCURRENCY_LIMITS", {"youtube": 2})
+    assert fair_share({"telegram$a": 5, "youtube$c": 5}, Counter({"youtube$c": 1}), 4) == {"telegram$a": 3, "youtube$c": 1}
@@ -0,0 +1,49 @@
+import fakeredis
+
+from src.app_celery.seen_posts import SeenPosts, bloom_size
+
+
+def test_bloom_size() -> None:
+    assert bloom_size(100_000, 0.01) == (958506, 7)
+    assert bloom_size(100_000, 0.001) == (1437759, 10)
+    assert bloom_size(1, 0.5)[1] == 1
+
+
+def test_seen_posts() -> None:
+    seen_posts = SeenPosts(fakeredis.FakeRedis(), capacity=100, fp_rate=0.001)
+    assert seen_posts.known("c", [1, 2]) == [False, False]
+
+    seen_posts.add("c", [1, 2])
+    seen_posts.add("c", [])
+    assert seen_posts.known("c", [1, 2, 3]) == [True, True, False]
+    assert seen_posts.known("other", [1]) == [False]
+
+    posts = [
+        {"channel_name": "c", "post_id": "1"},
+        {"channel_name": "c", "post_id": "3"},
+        {"channel_name": "other", "post_id": "1"},
+        {"channel_name": "c", "post_id": "x"},
+        {"post_id": "2"},
+    ]
+    assert seen_posts.drop_known(posts) == [posts[3], posts[4], posts[1], posts[2]]
+
+
+def test_seen_posts_grow() -> None:
+    seen_posts = SeenPosts(fakeredis.FakeRedis(), capacity=10, fp_rate=0.01)
+    for start in range(0, 300, 10):
+        seen_posts.add("c", list(range(start, start + 10)))
+
+    assert all(seen_posts.known("c", list(range(300))))
+    # a single layer sized for 10 would take almost every new id for a known one once it holds 300
+    assert sum(seen_posts.known("c", list(range(10_000, 11_000)))) < 1000 * 0.03
+
+
+def test_seen_posts_rebuild() -> None:
+    seen_posts = SeenPosts(fakeredis.FakeRedis(), capacity=10, fp_rate=0.01)
+    for start in range(0, 100, 10):
+        seen_posts.add("c", list(range(start, start + 10)))
+
+    seen_posts.rebuild("c", list(range(50, 150)))
+    assert seen_posts.known("c", [0, 50, 149]) == [False, True, True]
+    seen_posts.rebuild("c", [])
+    assert seen_posts.known("c", [50]) == [False]
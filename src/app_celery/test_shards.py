@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+
+import fakeredis
+
+from src.app_celery.shards import ShardQueue
+from src.dto.redis_task import Task
+
+
+def _shard(day: int) -> Task:
+    return Task(source="telegram", channel_name="c", dt_from=datetime(2024, 1, day, tzinfo=timezone.utc), dt_to=datetime(2024, 1, day + 1, tzinfo=timezone.utc))
+
+
+def _days(shards: list[Task]) -> list[int]:
+    return [shard.dt_from.day for shard in shards]
+
+
+def test_shard_queue() -> None:
+    shard_queue = ShardQueue(fakeredis.FakeRedis())
+    assert shard_queue.push("telegram$c", [_shard(1), _shard(2)]) == 2
+    assert shard_queue.push("telegram$c", [_shard(3)], priority=5) == 3
+    assert shard_queue.push("telegram$c", [_shard(4)], priority=5) == 4
+    assert shard_queue.head_priorities(["telegram$c", "telegram$empty"]) == {"telegram$c": 5}
+
+    assert _days(shard_queue.pop({"telegram$c": 3})["telegram$c"]) == [3, 4, 1]
+    assert shard_queue.head_priorities(["telegram$c"]) == {"telegram$c": 1}
+
+    shard_queue.requeue("telegram$c", _shard(4))
+    shard_queue.requeue("telegram$c", _shard(3))
+    assert shard_queue.pending() == {"telegram$c": 3}
+    assert shard_queue.head_priorities(["telegram$c"]) == {"telegram$c": 1}
+    assert _days(shard_queue.pop({"telegram$c": 5})["telegram$c"]) == [3, 4, 2]
+    assert shard_queue.pending() == {}
@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+
+import fakeredis
+import pytest
+
+from src.app_celery.state import RunningState
+from src.dto.redis_task import Task
+from src.env import settings
+
+_TASK = Task(source="telegram", channel_name="c", dt_from=datetime(2024, 1, 1, tzinfo=timezone.utc), dt_to=datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+
+def test_running_state(monkeypatch: pytest.MonkeyPatch) -> None:
+    running_state = RunningState(fakeredis.FakeRedis())
+    running_state.add("queued", "telegram$c", _TASK)
+    monkeypatch.setattr(settings, "TASK_PENDING_TTL", -1)
+    running_state.add("lost", "telegram$c", _TASK)
+    running_state.add("started", "telegram$c", _TASK)
+
+    assert sorted(running_state.expired()) == ["lost", "started"]
+    with running_state.keep_alive("started") as leased:
+        assert leased
+        assert running_state.expired() == ["lost"]
+
+    running_state.remove("lost")
+    with running_state.keep_alive("lost") as leased:
+        assert not leased
+    assert sorted(running_state.items()) == ["queued", "started"]
+
+    running_state.release("started", 0)
+    assert running_state.expired() == ["started"]
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Coroutine
+from typing import Any, TypeVar
+
+import httpx
+from celery.signals import worker_process_init, worker_process_shutdown
+
+from src.app_api.dependencies import DBM
+from src.env import settings
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+
+class WorkerRuntime:
+    """Event loop, database engine and http client shared by every task of a worker process.
+
+    The loop runs in a background thread for the whole life of the process, so the pooled
+    connections of the engine stay bound to it and tasks submit coroutines with `run`.
+    Started by worker_process_init, or lazily on first use with pools that do not send it.
+
+    With the threads pool (make app_celery_async) many tasks of one process wait on the same loop,
+    which multiplexes their I/O; the `-c` of the pool caps how many run at a time. The pool of the engine
+    has room for a connection per task thread, so a task never waits for another one to finish its insert.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._db: DBM | None = None
+        self._http_client: httpx.AsyncClient | None = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="worker-runtime-loop", daemon=True)
+            self._thread.start()
+            # a forked worker must not reuse the connections of its parent's engine
+            self._db = DBM(str(settings.DB_URL), engine_kwargs={"max_overflow": settings.worker_db_max_overflow})
+            self._http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=settings.WORKER_ASYNC_CONCURRENCY))
+            self._loop = loop
+            logger.info("worker runtime started")
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._loop is None:
+                return
+            loop, self._loop = self._loop, None
+            if self._db is not None:
+                asyncio.run_coroutine_threadsafe(self._db.close_connection(), loop).result()
+            if self._http_client is not None:
+                asyncio.run_coroutine_threadsafe(self._http_client.aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None:
+                self._thread.join()
+            loop.close()
+            self._db, self._http_client, self._thread = None, None, None
+            logger.info("worker runtime stopped")
+
+    def run(self, coro: Coroutine[Any, Any, _T]) -> _T:
+        """Runs a coroutine on the loop of the process and waits for its result."""
+        self.start()
+        assert self._loop is not None
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    @property
+    def db(self) -> DBM:
+        self.start()
+        assert self._db is not None
+        return self._db
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        self.start()
+        assert self._http_client is not None
+        return self._http_client
+
+
+worker_runtime = WorkerRuntime()
+
+
+@worker_process_init.connect
+def start_worker_runtime(**kwargs: object) -> None:
+    worker_runtime.start()
+
+
+@worker_process_shutdown.connect
+def stop_worker_runtime(**kwargs: object) -> None:
+    worker_runtime.stop()
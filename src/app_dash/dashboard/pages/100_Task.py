@@ -6,10 +6,10 @@ import streamlit as st
 from redis.asyncio import Redis
 
 from src import log
+from src.app_celery.channel_queue import enqueue_channel_task
 from src.app_dash.utils.streamlit import st_no_top_borders
 from src.common.moment import END_OF_EPOCH, START_OF_EPOCH
 from src.dto.post import Source
-from src.dto.redis_task import RedisTask
 
 logger = logging.getLogger(__name__)
 
@@ -29,14 +29,14 @@ async def main(*, log_extra: dict[str, str]) -> None:
         source = st.selectbox("Source", (Source.YOUTUBE, Source.TELEGRAM))
         channel_name = st.text_input("Channel name", help="t.me/CHANNEL_NAME")
         time_period = st.date_input("Select time period", (START_OF_EPOCH, END_OF_EPOCH), START_OF_EPOCH, END_OF_EPOCH, format="MM.DD.YYYY")
+        priority = st.number_input("Priority", min_value=1, value=1, step=1, help="higher priority channels are scraped first")
         if not st.form_submit_button("find"):
             return
     with st.spinner("wait few seconds..."):
         if isinstance(time_period, tuple) and len(time_period) == 2:
             start_of_epoch = datetime(time_period[0].year, time_period[0].month, time_period[0].day)
             end_of_epoch = datetime(time_period[-1].year, time_period[-1].month, time_period[-1].day)
-            await rds.sadd(str(RedisTask.channel_tasks.value), channel_name)
-            await rds.rpush(f"{source.value}${channel_name}", str(start_of_epoch), str(end_of_epoch))
+            await enqueue_channel_task(rds, source, channel_name, start_of_epoch, end_of_epoch, priority=int(priority))
             st.write(await rds.lrange(f"{source.value}${channel_name}", 0, -1))
 
         else:
@@ -21,11 +21,18 @@ async def main(*, log_extra: dict[str, str]) -> None:
     st_no_top_borders()
 
     st.header("TELEGRAM WORKER")
+    cow = await rds.get(RedisTask.counter_of_workers.value)
+    override = await rds.get(RedisTask.counter_of_workers_override.value)
+    st.write(f"count of workers in use: {cow.decode('utf-8') if cow else '-'} ({'manual' if override else 'automatic'})")
     with st.form("POST"):
-        cow = st.text_input("count of workers", help="t.me/CHANNEL_NAME")
-        if not st.form_submit_button("find"):
+        automatic = st.checkbox("automatic", value=override is None, help="let the manager adapt the count to the scraper load")
+        cow = st.number_input("count of workers", min_value=1, value=int(override or cow or 3), step=1)
+        if not st.form_submit_button("save"):
             return
-        await rds.set(RedisTask.counter_of_workers.value, cow)
+        if automatic:
+            await rds.delete(RedisTask.counter_of_workers_override.value)
+        else:
+            await rds.set(RedisTask.counter_of_workers_override.value, int(cow))
 
 
 with log.scope(logger, "Telegram_post") as _log_extra:
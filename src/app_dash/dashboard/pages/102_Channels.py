@@ -0,0 +1,47 @@
+import asyncio
+import logging
+
+import streamlit as st
+
+from src import log
+from src.app_api.dependencies import get_db_main_manager
+from src.app_dash.utils.streamlit import st_no_top_borders
+from src.db_main.cruds import channel_stats_crud
+
+logger = logging.getLogger(__name__)
+
+
+async def main(*, log_extra: dict[str, str]) -> None:
+    st.set_page_config(
+        page_title="TELEGRAM CHANNELS",
+        page_icon="👋",
+        layout="wide",
+    )
+    st_no_top_borders()
+
+    st.header("TELEGRAM CHANNELS")
+    # every streamlit run has its own event loop, so the engine cannot be shared between runs
+    db_manager = get_db_main_manager(new_connection=True)
+    try:
+        async with db_manager.session() as db:
+            channels_stats = await channel_stats_crud.get_channel_stats(db)
+    finally:
+        await db_manager.close_connection()
+    st.dataframe(
+        [
+            {
+                "channel": stats.tg_channel_id,
+                "posts": stats.posts_count,
+                "first post": stats.first_pb_date,
+                "last post": stats.last_pb_date,
+                "last post id": stats.last_post_id,
+                "last ingest": stats.last_ingested_at,
+            }
+            for stats in channels_stats
+        ],
+        use_container_width=True,
+    )
+
+
+with log.scope(logger, "Telegram_channels") as _log_extra:
+    asyncio.run(main(log_extra=_log_extra))
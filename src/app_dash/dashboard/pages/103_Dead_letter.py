@@ -0,0 +1,51 @@
+import asyncio
+import logging
+
+import streamlit as st
+from redis import Redis
+
+from src import log
+from src.app_celery.limiter import DeadLetter
+from src.app_celery.shards import ShardQueue
+from src.app_dash.utils.streamlit import st_no_top_borders
+from src.dto.redis_task import ManagerEvent, RedisTask
+
+logger = logging.getLogger(__name__)
+
+rds = Redis()
+dead_letter = DeadLetter(rds)
+shard_queue = ShardQueue(rds)
+
+
+async def main(*, log_extra: dict[str, str]) -> None:
+    st.set_page_config(
+        page_title="DEAD LETTER",
+        page_icon="👋",
+        layout="wide",
+    )
+    st_no_top_borders()
+
+    st.header("DEAD LETTER")
+    channels = sorted(dead_letter.channels())
+    if not channels:
+        st.write("no channel in the dead letter")
+        return
+    st.dataframe(
+        [{"channel": task_name, "failed task": f"{tsk.dt_from} - {tsk.dt_to}"} for task_name in channels for tsk in dead_letter.failed_tasks(task_name)],
+        use_container_width=True,
+    )
+    with st.form("POST"):
+        task_name = st.selectbox("Channel", channels)
+        requeue = st.checkbox("requeue the failed tasks", value=True, help="otherwise the failed ranges are dropped, only the queued ones are scraped")
+        if not st.form_submit_button("release"):
+            return
+    failed_tasks = dead_letter.release(task_name)
+    if requeue:
+        shard_queue.push(task_name, failed_tasks)
+    # the dispatcher picks the channel up right away
+    rds.rpush(str(RedisTask.manager_events.value), ManagerEvent.enqueued.value)
+    st.write(f"{task_name} released, {len(failed_tasks) if requeue else 0} failed tasks queued again")
+
+
+with log.scope(logger, "Dead_letter") as _log_extra:
+    asyncio.run(main(log_extra=_log_extra))
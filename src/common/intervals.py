@@ -0,0 +1,29 @@
+from datetime import datetime
+
+Interval = tuple[datetime, datetime]
+
+
+def merge_intervals(intervals: list[Interval]) -> list[Interval]:
+    """Merges overlapping and adjacent [start, end) intervals, result is sorted by start."""
+    merged: list[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(interval: Interval, covered: list[Interval]) -> list[Interval]:
+    """Returns the parts of `interval` that none of the `covered` intervals contains."""
+    gaps: list[Interval] = []
+    start, end = interval
+    for covered_start, covered_end in merge_intervals(covered):
+        if covered_end <= start or covered_start >= end:
+            continue
+        if covered_start > start:
+            gaps.append((start, covered_start))
+        start = max(start, covered_end)
+    if start < end:
+        gaps.append((start, end))
+    return gaps
@@ -0,0 +1,112 @@
+import json
+import re
+from collections.abc import AsyncIterator
+from typing import Any
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+# the end of a buffer that cuts a number before its fraction or exponent digits
+_NUMBER_TAIL = re.compile(r"(\.\d*)?([eE][-+]?\d*)?")
+
+
+class TruncatedJsonError(ValueError):
+    """The stream ended in the middle of the document."""
+
+
+async def iter_ndjson(chunks: AsyncIterator[str]) -> AsyncIterator[Any]:
+    """Decodes newline delimited JSON values as their lines arrive. Raises TruncatedJsonError if the last line is cut."""
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        try:
+            yield json.loads(buffer)
+        except json.JSONDecodeError as e:
+            raise TruncatedJsonError(f"truncated JSON line: {e}") from e
+
+
+def _incomplete(buffer: str, e: json.JSONDecodeError) -> bool:
+    """Whether the decoder only failed on the end of `buffer`, so the item may still be completed by the next chunks."""
+    rest = buffer[e.pos :]
+    if e.msg.startswith("Unterminated string") or not rest.strip(_WHITESPACE):
+        return True
+    if e.msg == "Expecting value":
+        return rest == "-" or any(literal.startswith(rest) for literal in _LITERALS)
+    if e.msg.startswith("Invalid \\uXXXX escape"):
+        return len(rest) < len("uXXXX")
+    return False
+
+
+def _decode_item(buffer: str, pos: int) -> tuple[Any, int] | None:
+    """Decodes the array item at `pos`, None if it is not complete yet. Raises ValueError if it is malformed."""
+    try:
+        item, end = _decoder.raw_decode(buffer, pos)
+    except json.JSONDecodeError as e:
+        if _incomplete(buffer, e):
+            return None
+        # the text after the item already arrived, waiting for more would not fix it
+        raise ValueError(f"malformed JSON array item: {e}") from e
+    # a number at the end of the buffer may still have digits coming
+    if isinstance(item, int | float) and not isinstance(item, bool) and _NUMBER_TAIL.fullmatch(buffer, end):
+        return None
+    if end == len(buffer) and not isinstance(item, dict | list | str):
+        return None
+    return item, end
+
+
+class _ArrayScan:
+    """Progress of iter_json_array through the top level array."""
+
+    def __init__(self) -> None:
+        self.started = False
+        self.finished = False
+
+    def scan(self, buffer: str) -> tuple[list[Any], int]:
+        """Decodes the complete items of `buffer`, returns them with the position the next chunk continues from."""
+        items: list[Any] = []
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer) or self.finished:
+                return items, pos
+            if not self.started:
+                if buffer[pos] != "[":
+                    raise ValueError(f"expected a JSON array, got {buffer[pos : pos + 20]!r}")
+                self.started = True
+                pos += 1
+            elif buffer[pos] == "]":
+                self.finished = True
+                pos += 1
+            elif buffer[pos] == ",":
+                pos += 1
+            else:
+                decoded = _decode_item(buffer, pos)
+                if decoded is None:
+                    return items, pos
+                item, end = decoded
+                items.append(item)
+                pos = end
+
+
+async def iter_json_array(chunks: AsyncIterator[str]) -> AsyncIterator[Any]:
+    """Decodes the items of a top level JSON array as they arrive, without holding the whole document.
+
+    Only the item being received is buffered. Raises ValueError if the document is not an array
+    or an item is malformed, and TruncatedJsonError if it ends before the array is closed.
+    """
+    array = _ArrayScan()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        items, pos = array.scan(buffer)
+        for item in items:
+            yield item
+        buffer = buffer[pos:]
+    if not array.started or not array.finished:
+        raise TruncatedJsonError("truncated JSON array")
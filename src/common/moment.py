@@ -1,5 +1,6 @@
 from copy import copy
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from enum import Enum, unique
 
 START_OF_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
 
@@ -16,6 +17,12 @@ def as_utc(dt: datetime) -> datetime:
     return dt.astimezone(timezone.utc)
 
 
+def month_start(dt: datetime) -> datetime:
+    """Start of the UTC calendar month of `dt`."""
+    dt = as_utc(dt)
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
 def select_max_dt(*args: datetime) -> datetime:
     assert len(args) > 0
     max_dt = args[0]
@@ -25,6 +32,38 @@ def select_max_dt(*args: datetime) -> datetime:
     return max_dt
 
 
+@unique
+class Window(Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+    YEAR = "year"
+
+
+def next_window_start(dt: datetime, window: Window) -> datetime:
+    day = datetime(dt.year, dt.month, dt.day, tzinfo=dt.tzinfo)
+    match window:
+        case Window.DAY:
+            return day + timedelta(days=1)
+        case Window.WEEK:
+            return day + timedelta(days=7 - dt.weekday())
+        case Window.MONTH:
+            return datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1, tzinfo=dt.tzinfo)
+        case Window.YEAR:
+            return datetime(dt.year + 1, 1, 1, tzinfo=dt.tzinfo)
+
+
+def split_period(dt_from: datetime, dt_to: datetime, window: Window) -> list[tuple[datetime, datetime]]:
+    """Splits [dt_from, dt_to) into consecutive periods aligned to calendar windows."""
+    periods = []
+    start = dt_from
+    while start < dt_to:
+        end = min(next_window_start(start, window), dt_to)
+        periods.append((start, end))
+        start = end
+    return periods
+
+
 def test_select_max_dt() -> None:
     assert as_utc(datetime(2024, 1, 1)) == datetime(2024, 1, 1, tzinfo=timezone.utc)
     assert as_utc(datetime(2024, 1, 1)) == as_utc(datetime(2024, 1, 1, tzinfo=timezone.utc))
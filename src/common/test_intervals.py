@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from src.common.intervals import merge_intervals, subtract_intervals
+
+
+def _dt(day: int) -> datetime:
+    return datetime(2024, 1, day)
+
+
+def test_merge_intervals() -> None:
+    assert merge_intervals([]) == []
+    assert merge_intervals([(_dt(5), _dt(8)), (_dt(1), _dt(3)), (_dt(3), _dt(4)), (_dt(7), _dt(10))]) == [(_dt(1), _dt(4)), (_dt(5), _dt(10))]
+    assert merge_intervals([(_dt(1), _dt(10)), (_dt(2), _dt(3))]) == [(_dt(1), _dt(10))]
+
+
+def test_subtract_intervals() -> None:
+    assert subtract_intervals((_dt(1), _dt(10)), []) == [(_dt(1), _dt(10))]
+    assert subtract_intervals((_dt(1), _dt(10)), [(_dt(1), _dt(10))]) == []
+    assert subtract_intervals((_dt(5), _dt(8)), [(_dt(1), _dt(20))]) == []
+    assert subtract_intervals((_dt(1), _dt(10)), [(_dt(3), _dt(4)), (_dt(6), _dt(7)), (_dt(9), _dt(12))]) == [
+        (_dt(1), _dt(3)),
+        (_dt(4), _dt(6)),
+        (_dt(7), _dt(9)),
+    ]
+    assert subtract_intervals((_dt(5), _dt(10)), [(_dt(1), _dt(3)), (_dt(12), _dt(15))]) == [(_dt(5), _dt(10))]
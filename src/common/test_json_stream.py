@@ -0,0 +1,44 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+
+from src.common.json_stream import TruncatedJsonError, iter_json_array, iter_ndjson
+
+
+async def _chunks(text: str, size: int) -> AsyncIterator[str]:
+    for i in range(0, len(text), size):
+        yield text[i : i + size]
+
+
+def _collect(items: AsyncIterator[Any]) -> list[Any]:
+    async def collect() -> list[Any]:
+        return [item async for item in items]
+
+    return asyncio.run(collect())
+
+
+def test_iter_json_array() -> None:
+    values = [{"post_id": "1", "content": "a, [b] {c}"}, {"post_id": "2", "content": 'x\\"y'}, 12345, -1.25e-3, [1, 2], "s", None]
+    text = json.dumps(values, indent=2)
+    for size in (1, 3, 7, len(text)):
+        assert _collect(iter_json_array(_chunks(text, size))) == values
+    assert _collect(iter_json_array(_chunks(" [ ] ", 2))) == []
+    with pytest.raises(ValueError):
+        _collect(iter_json_array(_chunks('{"detail": "error"}', 4)))
+    with pytest.raises(TruncatedJsonError):
+        _collect(iter_json_array(_chunks('[{"post_id": 1}, {"post_', 4)))
+    for size in (1, 4, 100):
+        with pytest.raises(ValueError, match="malformed"):
+            _collect(iter_json_array(_chunks('[{"post_id": 1}, {post_id: 2}, {"post_id": 3}]', size)))
+
+
+def test_iter_ndjson() -> None:
+    values = [{"post_id": 1}, {"post_id": 2}, {"post_id": 3}]
+    text = "\n".join(json.dumps(value) for value in values) + "\n\n"
+    for size in (1, 5, len(text)):
+        assert _collect(iter_ndjson(_chunks(text, size))) == values
+    with pytest.raises(TruncatedJsonError):
+        _collect(iter_ndjson(_chunks('{"post_id": 1}\n{"post_', 4)))
@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+
+from src.common.moment import Window, month_start, split_period
+
+
+def test_split_period() -> None:
+    assert split_period(datetime(2024, 1, 15), datetime(2024, 3, 10), Window.MONTH) == [
+        (datetime(2024, 1, 15), datetime(2024, 2, 1)),
+        (datetime(2024, 2, 1), datetime(2024, 3, 1)),
+        (datetime(2024, 3, 1), datetime(2024, 3, 10)),
+    ]
+    assert split_period(datetime(2023, 12, 20, tzinfo=timezone.utc), datetime(2024, 1, 2, tzinfo=timezone.utc), Window.MONTH) == [
+        (datetime(2023, 12, 20, tzinfo=timezone.utc), datetime(2024, 1, 1, tzinfo=timezone.utc)),
+        (datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 2, tzinfo=timezone.utc)),
+    ]
+    # 2024-07-03 is a Wednesday, weeks start on Monday
+    assert split_period(datetime(2024, 7, 3, 12), datetime(2024, 7, 16), Window.WEEK) == [
+        (datetime(2024, 7, 3, 12), datetime(2024, 7, 8)),
+        (datetime(2024, 7, 8), datetime(2024, 7, 15)),
+        (datetime(2024, 7, 15), datetime(2024, 7, 16)),
+    ]
+    assert split_period(datetime(2024, 1, 1), datetime(2024, 1, 1), Window.DAY) == []
+
+
+def test_month_start() -> None:
+    assert month_start(datetime(2024, 3, 31, 23, tzinfo=timezone(timedelta(hours=-3)))) == datetime(2024, 4, 1, tzinfo=timezone.utc)
+    assert month_start(datetime(2024, 4, 1, 1, tzinfo=timezone(timedelta(hours=3)))) == datetime(2024, 3, 1, tzinfo=timezone.utc)
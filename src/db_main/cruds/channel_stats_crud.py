@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db_main.models.channel_stats import ChannelStatsDbMdl
+from src.dto.post import PostRecord
+
+
+async def add_tg_posts_to_channel_stats(db: AsyncSession, tg_posts: list[PostRecord]) -> None:
+    """Adds newly stored posts to the stats of their channels. Does not commit, the caller's insert transaction does.
+
+    `tg_posts` must hold only posts that were not stored before, otherwise they are counted twice.
+    """
+    per_channel: defaultdict[str, list[PostRecord]] = defaultdict(list)
+    for tg_post in tg_posts:
+        per_channel[tg_post.channel_name].append(tg_post)
+    if not per_channel:
+        return
+
+    # channels are upserted in a fixed order so that concurrent ingests lock the rows in the same order
+    stmt = insert(ChannelStatsDbMdl).values([
+        {
+            "tg_channel_id": channel_name,
+            "posts_count": len(posts),
+            "first_pb_date": min(tg_post.pb_date for tg_post in posts),
+            "last_pb_date": max(tg_post.pb_date for tg_post in posts),
+            "last_post_id": max(tg_post.post_id for tg_post in posts),
+        }
+        for channel_name, posts in sorted(per_channel.items())
+    ])
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ChannelStatsDbMdl.tg_channel_id],
+            set_={
+                "posts_count": ChannelStatsDbMdl.posts_count + stmt.excluded.posts_count,
+                "first_pb_date": func.least(ChannelStatsDbMdl.first_pb_date, stmt.excluded.first_pb_date),
+                "last_pb_date": func.greatest(ChannelStatsDbMdl.last_pb_date, stmt.excluded.last_pb_date),
+                "last_post_id": func.greatest(ChannelStatsDbMdl.last_post_id, stmt.excluded.last_post_id),
+                "last_ingested_at": func.now(),
+            },
+        )
+    )
+
+
+async def get_channel_stats(db: AsyncSession) -> list[ChannelStatsDbMdl]:
+    return list(await db.scalars(select(ChannelStatsDbMdl).order_by(ChannelStatsDbMdl.tg_channel_id)))
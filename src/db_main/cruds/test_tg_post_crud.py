@@ -0,0 +1,61 @@
+import uuid
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.db_main.cruds import tg_post_crud
+from src.db_main.models.channel_stats import ChannelStatsDbMdl
+from src.db_main.models.tg_post import TgPostDbMdl
+from src.dto.post import PostRecord
+from src.env import settings
+
+
+@pytest.fixture
+async def db() -> AsyncIterator[AsyncSession]:
+    engine = create_async_engine(str(settings.DB_URL))
+    try:
+        async with engine.connect():
+            pass
+    except OSError:
+        await engine.dispose()
+        pytest.skip("the test database is not running")
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+async def test_bulk_create_tg_posts_copy(db: AsyncSession, mocker: MockerFixture) -> None:
+    mocker.patch.object(settings, "COPY_MIN_ROWS", 1)
+    mocker.patch.object(tg_post_crud.post_cache, "invalidate", mocker.AsyncMock())
+    channel_name = f"test_{uuid.uuid4().hex}"
+    pb_date = datetime(2024, 5, 31, 22, tzinfo=UTC)
+    posts = [PostRecord(channel_name, i, f"post {i}", pb_date + timedelta(hours=i), f"https://t.me/{channel_name}/{i}") for i in range(4)]
+    try:
+        new_posts = await tg_post_crud.bulk_create_tg_posts(db, posts)
+        stored = await db.scalars(select(TgPostDbMdl.post_id).where(TgPostDbMdl.tg_channel_id == channel_name).order_by(TgPostDbMdl.post_id))
+
+        assert [post.post_id for post in new_posts] == [0, 1, 2, 3]
+        assert list(stored) == [0, 1, 2, 3]
+        again = await tg_post_crud.bulk_create_tg_posts(db, [*posts, PostRecord(channel_name, 4, "post 4", pb_date, f"https://t.me/{channel_name}/4")])
+        assert [post.post_id for post in again] == [4]
+    finally:
+        await db.execute(delete(TgPostDbMdl).where(TgPostDbMdl.tg_channel_id == channel_name))
+        await db.execute(delete(ChannelStatsDbMdl).where(ChannelStatsDbMdl.tg_channel_id == channel_name))
+        await db.commit()
+
+
+async def test_with_partitions_after_detach(mocker: MockerFixture) -> None:
+    month = datetime(2024, 5, 1, tzinfo=UTC)
+    mocker.patch.object(tg_post_crud, "_known_partitions", {month})
+    db = mocker.AsyncMock()
+    insert_posts = mocker.AsyncMock(side_effect=[IntegrityError("INSERT", {}, Exception('no partition of relation "tg_posts" found for row')), ["stored"]])
+
+    assert await tg_post_crud._with_partitions(db, [month + timedelta(days=3)], insert_posts) == ["stored"]
+    assert insert_posts.await_count == 2
+    db.rollback.assert_awaited_once()
+    assert tg_post_crud._known_partitions == set()
@@ -1,13 +1,92 @@
-from collections.abc import Sequence
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Sequence
+from datetime import datetime, timedelta
+from typing import TypeVar
 
-from sqlalchemy import select
+from sqlalchemy import DateTime, bindparam, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db_main.models.tg_post import TgPostDbMdl
-from src.dto.post import Post
+from src.common.moment import Window, as_utc, month_start, next_window_start, split_period
+from src.db_main.cruds.channel_stats_crud import add_tg_posts_to_channel_stats
+from src.db_main.models.channel_stats import ChannelStatsDbMdl
+from src.db_main.models.tg_post import TG_POSTS_TS_CONFIG, TgPostDbMdl
+from src.db_main.post_cache import PostCache, post_cache
+from src.dto.post import Post, PostRecord, StoredPost
+from src.env import settings
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 1000  # 5 bind parameters per row, asyncpg allows 32767 per statement
+
+_STAGING_TABLE = "tg_posts_staging"
+_STAGING_COLUMNS = ["post_id", "tg_channel_id", "tg_pb_date", "content", "link"]
+
+_known_partitions: set[datetime] = set()
+
+_T = TypeVar("_T")
+
+
+def tg_posts_partition_name(dt: datetime) -> str:
+    month = month_start(dt)
+    return f"tg_posts_y{month.year:04d}m{month.month:02d}"
+
+
+async def ensure_tg_posts_partitions(db: AsyncSession, dates: Iterable[datetime]) -> None:
+    """Creates the monthly tg_posts partitions of `dates` that do not exist yet.
+
+    The DDL is committed right away, which releases the partition lock before the posts are inserted.
+    Partitions seen by this process are remembered, so a steady ingest costs no round trip.
+    """
+    missing = {month_start(dt): as_utc(dt) for dt in dates if month_start(dt) not in _known_partitions}
+    if not missing:
+        return
+    await db.execute(
+        text("SELECT tg_posts_ensure_partition(ts) FROM unnest(:dates) AS ts").bindparams(bindparam("dates", type_=ARRAY(DateTime(timezone=True)))),
+        {"dates": list(missing.values())},
+    )
+    await db.commit()
+    _known_partitions.update(missing)
+
+
+async def _with_partitions(db: AsyncSession, dates: Iterable[datetime], insert_posts: Callable[[], Awaitable[_T]]) -> _T:
+    """Runs an insert that ensures its partitions, once more if one of them was detached by another process meanwhile.
+
+    The partitions remembered by this process are not checked again, so a detached one is only noticed when the insert fails.
+    """
+    try:
+        return await insert_posts()
+    except IntegrityError as e:
+        if "no partition of relation" not in str(e.orig):
+            raise
+        await db.rollback()
+        stale = {month_start(dt) for dt in dates} & _known_partitions
+        logger.warning(f"tg_posts partitions detached by another process: {sorted(tg_posts_partition_name(month) for month in stale)}")
+        _known_partitions.difference_update(stale)
+        return await insert_posts()
+
+
+async def detach_tg_posts_partition(db: AsyncSession, month: datetime) -> str:
+    """Detaches the partition of `month` from tg_posts so it can be archived or dropped, returns its name.
+
+    Other processes still take the partition for existing: their next insert into the month fails and ensures it again,
+    which creates a new partition once the detached table is dropped or renamed.
+    """
+    partition_name = tg_posts_partition_name(month)
+    await db.execute(text(f'ALTER TABLE tg_posts DETACH PARTITION "{partition_name}"'))
+    await db.commit()
+    _known_partitions.discard(month_start(month))
+    return partition_name
 
 
 async def create_tg_post(db: AsyncSession, tg_post: Post) -> TgPostDbMdl:
+    return await _with_partitions(db, [tg_post.pb_date], lambda: _create_tg_post(db, tg_post))
+
+
+async def _create_tg_post(db: AsyncSession, tg_post: Post) -> TgPostDbMdl:
+    await ensure_tg_posts_partitions(db, [tg_post.pb_date])
     post = TgPostDbMdl(
         post_id=tg_post.post_id,
         tg_channel_id=tg_post.channel_name,
@@ -16,22 +95,237 @@ async def create_tg_post(db: AsyncSession, tg_post: Post) -> TgPostDbMdl:
         link=str(tg_post.link),
     )
     db.add(post)
+    await add_tg_posts_to_channel_stats(db, [PostRecord.from_post(tg_post)])
     await db.commit()
+    await post_cache.invalidate([(tg_post.channel_name, tg_post.pb_date)])
     return post
 
-async def create_tg_posts(db: AsyncSession, tg_posts: list[Post]) -> list[Post]:
-    db_id_posts = await db.execute(select(TgPostDbMdl.post_id))
-    id_posts = db_id_posts.scalars().all()
-    posts: list[Post] = []
-    for tg_post in tg_posts:
-        if tg_post.post_id not in id_posts:
-            posts.append(tg_post)
-            db.add(TgPostDbMdl(
-        post_id=tg_post.post_id,
-        tg_channel_id=tg_post.channel_name,
-        tg_pb_date=tg_post.pb_date,
-        content=tg_post.content,
-        link=str(tg_post.link),
-    ))
+
+async def create_tg_posts(db: AsyncSession, tg_posts: list[PostRecord]) -> list[PostRecord]:
+    """Inserts the posts that are not stored yet and returns them.
+
+    Dedupe is done by the (tg_channel_id, post_id, tg_pb_date) unique constraint, so the cost depends
+    on the size of the batch only, not on the size of the table. channel_stats is updated in the same transaction
+    and the cached pages of the months that got new posts are invalidated once it commits.
+    """
+    return await _with_partitions(db, (tg_post.pb_date for tg_post in tg_posts), lambda: _create_tg_posts(db, tg_posts))
+
+
+async def _create_tg_posts(db: AsyncSession, tg_posts: list[PostRecord]) -> list[PostRecord]:
+    unique_posts = list({(tg_post.channel_name, tg_post.post_id): tg_post for tg_post in tg_posts}.values())
+    await ensure_tg_posts_partitions(db, (tg_post.pb_date for tg_post in unique_posts))
+    inserted: set[tuple[str, int]] = set()
+    for i in range(0, len(unique_posts), INSERT_BATCH_SIZE):
+        stmt = (
+            insert(TgPostDbMdl)
+            .values([
+                {
+                    "post_id": tg_post.post_id,
+                    "tg_channel_id": tg_post.channel_name,
+                    "tg_pb_date": tg_post.pb_date,
+                    "content": tg_post.content,
+                    "link": tg_post.link,
+                }
+                for tg_post in unique_posts[i : i + INSERT_BATCH_SIZE]
+            ])
+            .on_conflict_do_nothing(index_elements=[TgPostDbMdl.tg_channel_id, TgPostDbMdl.post_id, TgPostDbMdl.tg_pb_date])
+            .returning(TgPostDbMdl.tg_channel_id, TgPostDbMdl.post_id)
+        )
+        inserted.update((channel_id, post_id) for channel_id, post_id in await db.execute(stmt))
+    new_posts = [tg_post for tg_post in unique_posts if (tg_post.channel_name, tg_post.post_id) in inserted]
+    await add_tg_posts_to_channel_stats(db, new_posts)
     await db.commit()
-    return posts
+    await post_cache.invalidate((tg_post.channel_name, tg_post.pb_date) for tg_post in new_posts)
+    return new_posts
+
+
+async def bulk_create_tg_posts(db: AsyncSession, tg_posts: list[PostRecord]) -> list[PostRecord]:
+    """Same as create_tg_posts, for big backfills.
+
+    The posts are streamed with a binary COPY into a temporary staging table and merged into
+    tg_posts by a single INSERT ... SELECT. Batches under COPY_MIN_ROWS take the plain insert path.
+    """
+    if len(tg_posts) < settings.COPY_MIN_ROWS:
+        return await create_tg_posts(db, tg_posts)
+    return await _with_partitions(db, (tg_post.pb_date for tg_post in tg_posts), lambda: _copy_tg_posts(db, tg_posts))
+
+
+async def _copy_tg_posts(db: AsyncSession, tg_posts: list[PostRecord]) -> list[PostRecord]:
+    started_at = time.monotonic()
+    unique_posts = list({(tg_post.channel_name, tg_post.post_id): tg_post for tg_post in tg_posts}.values())
+    await ensure_tg_posts_partitions(db, (tg_post.pb_date for tg_post in unique_posts))
+    # executed through the session, so the transaction is open before the COPY: the asyncpg adapter only begins one
+    # on a cursor execute, an earlier COPY would autocommit and ON COMMIT DELETE ROWS would empty the staging table
+    await db.execute(
+        text(
+            f"""
+            CREATE TEMPORARY TABLE IF NOT EXISTS {_STAGING_TABLE} (
+                post_id integer NOT NULL,
+                tg_channel_id varchar NOT NULL,
+                tg_pb_date timestamptz NOT NULL,
+                content varchar NOT NULL,
+                link varchar NOT NULL
+            ) ON COMMIT DELETE ROWS
+            """
+        )
+    )
+    connection = await (await db.connection()).get_raw_connection()
+    driver_connection = connection.driver_connection
+    await driver_connection.copy_records_to_table(
+        _STAGING_TABLE,
+        records=((tg_post.post_id, tg_post.channel_name, as_utc(tg_post.pb_date), tg_post.content, tg_post.link) for tg_post in unique_posts),
+        columns=_STAGING_COLUMNS,
+    )
+    result = await db.execute(
+        text(
+            f"""
+            INSERT INTO tg_posts ({", ".join(_STAGING_COLUMNS)})
+            SELECT {", ".join(_STAGING_COLUMNS)} FROM {_STAGING_TABLE}
+            ON CONFLICT (tg_channel_id, post_id, tg_pb_date) DO NOTHING
+            RETURNING tg_channel_id, post_id
+            """
+        )
+    )
+    inserted = {tuple(row) for row in result}
+    new_posts = [tg_post for tg_post in unique_posts if (tg_post.channel_name, tg_post.post_id) in inserted]
+    await add_tg_posts_to_channel_stats(db, new_posts)
+    await db.commit()
+    await post_cache.invalidate((tg_post.channel_name, tg_post.pb_date) for tg_post in new_posts)
+
+    duration = time.monotonic() - started_at
+    logger.info(f"COPY ingest :: {len(unique_posts)} rows, {len(inserted)} new in {duration:.2f}s ({len(unique_posts) / max(duration, 1e-6):.0f} rows/s)")
+    return new_posts
+
+
+async def stream_tg_posts(
+    db: AsyncSession,
+    channel_name: str,
+    dt_from: datetime | None = None,
+    dt_to: datetime | None = None,
+    after: tuple[datetime, int] | None = None,
+    limit: int | None = None,
+) -> AsyncIterator[TgPostDbMdl]:
+    """Posts of a channel in (tg_pb_date, post_id) order, read through a server-side cursor.
+
+    `after` is the keyset cursor, the (tg_pb_date, post_id) of the last post already read.
+    Memory stays bounded by POSTS_STREAM_CHUNK whatever the size of the channel.
+    """
+    stmt = select(TgPostDbMdl).where(TgPostDbMdl.tg_channel_id == channel_name)
+    if dt_from is not None:
+        stmt = stmt.where(TgPostDbMdl.tg_pb_date >= dt_from)
+    if dt_to is not None:
+        stmt = stmt.where(TgPostDbMdl.tg_pb_date < dt_to)
+    if after is not None:
+        stmt = stmt.where(tuple_(TgPostDbMdl.tg_pb_date, TgPostDbMdl.post_id) > tuple_(as_utc(after[0]), after[1]))
+    stmt = stmt.order_by(TgPostDbMdl.tg_pb_date, TgPostDbMdl.post_id).limit(limit)
+    result = await db.stream_scalars(stmt.execution_options(yield_per=settings.POSTS_STREAM_CHUNK))
+    async for post in result:
+        yield post
+
+
+def _stored(post: TgPostDbMdl) -> StoredPost:
+    return StoredPost(channel_name=post.tg_channel_id, post_id=post.post_id, pb_date=post.tg_pb_date, content=post.content, link=post.link)
+
+
+async def _cache_month(db: AsyncSession, cache: PostCache, channel_name: str, month: datetime, generation: int) -> AsyncIterator[StoredPost]:
+    """Streams the posts of a month missing from the cache and caches its page on the way.
+
+    Past POST_CACHE_MAX_MONTH_POSTS the month is marked too big instead and the stream goes on, so it is read only once.
+    """
+    page: list[StoredPost] | None = []
+    async for post in stream_tg_posts(db, channel_name, month, next_window_start(month, Window.MONTH)):
+        stored = _stored(post)
+        if page is not None:
+            page.append(stored)
+            if len(page) > settings.POST_CACHE_MAX_MONTH_POSTS:
+                page = None
+                await cache.set(channel_name, month, None, generation)
+        yield stored
+    if page is not None:
+        await cache.set(channel_name, month, page, generation)
+
+
+async def _month_posts(db: AsyncSession, cache: PostCache, channel_name: str, month: datetime, start: datetime, end: datetime) -> AsyncIterator[StoredPost]:
+    """Posts of a month page from `start` to `end`, read through the cache. Months marked too big are read from postgres."""
+    posts, generation, too_big = await cache.get(channel_name, month)
+    if too_big:
+        async for post in stream_tg_posts(db, channel_name, start, end):
+            yield _stored(post)
+        return
+    if posts is not None:
+        for post in posts:
+            if start <= post.pb_date < end:
+                yield post
+        return
+    async for post in _cache_month(db, cache, channel_name, month, generation):
+        if start <= post.pb_date < end:
+            yield post
+
+
+async def read_tg_posts(
+    db: AsyncSession,
+    channel_name: str,
+    dt_from: datetime | None = None,
+    dt_to: datetime | None = None,
+    after: tuple[datetime, int] | None = None,
+    limit: int | None = None,
+    cache: PostCache = post_cache,
+) -> AsyncIterator[StoredPost]:
+    """Same as stream_tg_posts, read month by month through the post cache.
+
+    A cached page holds a whole month in memory, so the cache serves bounded reads, unbounded exports use stream_tg_posts.
+    The months to read are bounded by channel_stats, so a channel without posts costs no scan.
+    """
+    stats = await db.get(ChannelStatsDbMdl, channel_name)
+    if stats is None:
+        return
+    after_key = (as_utc(after[0]), after[1]) if after is not None else None
+    start = max(as_utc(dt) for dt in (stats.first_pb_date, dt_from, after_key[0] if after_key else None) if dt is not None)
+    end = min(as_utc(dt) for dt in (stats.last_pb_date + timedelta(microseconds=1), dt_to) if dt is not None)
+
+    count = 0
+    for month, _ in split_period(month_start(start), end, Window.MONTH):
+        async for post in _month_posts(db, cache, channel_name, month, max(start, month), min(end, next_window_start(month, Window.MONTH))):
+            if after_key is not None and (post.pb_date, post.post_id) <= after_key:
+                continue
+            if limit is not None and count >= limit:
+                return
+            count += 1
+            yield post
+
+
+async def search_tg_posts(
+    db: AsyncSession,
+    query: str,
+    channel_name: str | None = None,
+    dt_from: datetime | None = None,
+    dt_to: datetime | None = None,
+    after: tuple[float, datetime, int] | None = None,
+    limit: int = settings.POSTS_SEARCH_PAGE_SIZE,
+) -> list[tuple[TgPostDbMdl, float]]:
+    """Posts whose content matches a web-search style `query`, best ranked first.
+
+    Matching goes through the GIN index of content_tsv. `after` is the keyset cursor,
+    the (rank, tg_pb_date, id) of the last hit already returned.
+    """
+    ts_query = func.websearch_to_tsquery(TG_POSTS_TS_CONFIG, query)
+    rank = func.ts_rank(TgPostDbMdl.content_tsv, ts_query).label("rank")
+    stmt = select(TgPostDbMdl, rank).where(TgPostDbMdl.content_tsv.bool_op("@@")(ts_query))
+    if channel_name is not None:
+        stmt = stmt.where(TgPostDbMdl.tg_channel_id == channel_name)
+    if dt_from is not None:
+        stmt = stmt.where(TgPostDbMdl.tg_pb_date >= dt_from)
+    if dt_to is not None:
+        stmt = stmt.where(TgPostDbMdl.tg_pb_date < dt_to)
+    if after is not None:
+        stmt = stmt.where(tuple_(rank, TgPostDbMdl.tg_pb_date, TgPostDbMdl.id) < tuple_(after[0], as_utc(after[1]), after[2]))
+    stmt = stmt.order_by(rank.desc(), TgPostDbMdl.tg_pb_date.desc(), TgPostDbMdl.id.desc()).limit(limit)
+    return list((await db.execute(stmt)).tuples())
+
+
+async def stream_tg_post_ids(db: AsyncSession, channel_name: str) -> AsyncIterator[int]:
+    result = await db.stream_scalars(
+        select(TgPostDbMdl.post_id).where(TgPostDbMdl.tg_channel_id == channel_name).execution_options(yield_per=settings.POSTS_STREAM_CHUNK)
+    )
+    async for post_id in result:
+        yield post_id
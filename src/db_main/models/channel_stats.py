@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db_main.database import Base
+
+
+class ChannelStatsDbMdl(Base):
+    """Aggregates of tg_posts per channel, kept up to date by every ingest in the same transaction."""
+
+    __tablename__ = "channel_stats"
+    tg_channel_id: Mapped[str] = mapped_column(primary_key=True)
+    posts_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    first_pb_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_pb_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_post_id: Mapped[int] = mapped_column(nullable=False)
+    last_ingested_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
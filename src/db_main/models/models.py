@@ -1,4 +1,5 @@
 from src.db_main.database import Base
+from src.db_main.models.channel_stats import ChannelStatsDbMdl
 from src.db_main.models.tg_post import TgPostDbMdl
 
-__all__ = ("Base", "TgPostDbMdl")
+__all__ = ("Base", "ChannelStatsDbMdl", "TgPostDbMdl")
@@ -1,20 +1,37 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, func
+from sqlalchemy import Computed, DateTime, Index, Sequence, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.db_main.database import Base
 
+TG_POSTS_ID_SEQ = Sequence("tg_posts_id_seq")
+TG_POSTS_TS_CONFIG = "simple"  # posts mix languages, so words are indexed as they are, without stemming
+
 
 class TgPostDbMdl(Base):
+    """Telegram posts, range partitioned by month of tg_pb_date.
+
+    Partitions are named tg_posts_yYYYYmMM and created on demand by the tg_posts_ensure_partition() SQL function.
+    Keys of a partitioned table must contain the partition key, hence tg_pb_date in the primary key and in the dedupe constraint.
+    """
+
     __tablename__ = "tg_posts"
-    id: Mapped[int] = mapped_column(primary_key=True, unique=True, nullable=False)
+    __table_args__ = (
+        UniqueConstraint("tg_channel_id", "post_id", "tg_pb_date", name="uq_tg_posts_channel_post"),
+        Index("ix_tg_posts_channel_pb_date", "tg_channel_id", "tg_pb_date", "post_id"),
+        Index("ix_tg_posts_content_tsv", "content_tsv", postgresql_using="gin"),
+        {"postgresql_partition_by": "RANGE (tg_pb_date)"},
+    )
+    id: Mapped[int] = mapped_column(TG_POSTS_ID_SEQ, primary_key=True, nullable=False, server_default=TG_POSTS_ID_SEQ.next_value())
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     # props:
     post_id: Mapped[int] = mapped_column(nullable=False, default=0)
     tg_channel_id: Mapped[str] = mapped_column(nullable=False, default="", server_default="")
-    tg_pb_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=func.now(), server_default=func.now())
+    tg_pb_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, nullable=False, default=func.now(), server_default=func.now())
     content: Mapped[str] = mapped_column(nullable=False, default="", server_default="")
     link: Mapped[str] = mapped_column(nullable=False, default="", server_default="")
+    content_tsv: Mapped[str] = mapped_column(TSVECTOR, Computed(f"to_tsvector('{TG_POSTS_TS_CONFIG}', content)", persisted=True), deferred=True)
     # relationships:
@@ -0,0 +1,36 @@
+import os
+import socket
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from src.dto.db_pool import DbPoolMetrics
+from src.dto.redis_task import RedisTask
+
+POOL_METRICS_TTL = 300  # seconds a snapshot outlives its process
+
+
+def _key(process_name: str) -> str:
+    return f"{RedisTask.db_pool_metrics.value}:{process_name}"
+
+
+def process_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def publish_pool_metrics(rds: Redis, metrics: DbPoolMetrics) -> None:
+    """Shares the pool snapshot of this process, so the pools of all api and worker processes can be read in one place."""
+    rds.set(_key(process_name()), metrics.model_dump_json(), ex=POOL_METRICS_TTL)
+
+
+async def publish_pool_metrics_async(rds: AsyncRedis, metrics: DbPoolMetrics) -> None:
+    await rds.set(_key(process_name()), metrics.model_dump_json(), ex=POOL_METRICS_TTL)
+
+
+async def all_pool_metrics(rds: AsyncRedis) -> dict[str, DbPoolMetrics]:
+    prefix = _key("")
+    keys = [key async for key in rds.scan_iter(match=f"{prefix}*")]
+    values = await rds.mget(keys) if keys else []
+    return {
+        key.decode("utf-8").removeprefix(prefix): DbPoolMetrics.model_validate_json(value) for key, value in zip(keys, values, strict=True) if value is not None
+    }
@@ -0,0 +1,117 @@
+import json
+import time
+from collections.abc import Iterable
+from datetime import datetime
+
+from redis.asyncio import Redis
+
+from src.common.moment import month_start
+from src.dto.post import StoredPost
+from src.dto.redis_task import RedisTask
+from src.env import settings
+
+# KEYS[1] is the page, KEYS[2] its generation, KEYS[3] the lru sorted set.
+# ARGV is the generation read before the page was loaded, the page, its ttl, the current time and the max number of pages.
+# The page is not stored if an ingest invalidated it meanwhile, then the least recently read pages are evicted.
+_STORE_PAGE_LUA = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('ZADD', KEYS[3], ARGV[4], KEYS[1])
+local excess = redis.call('ZCARD', KEYS[3]) - tonumber(ARGV[5])
+if excess > 0 then
+    local evicted = redis.call('ZRANGE', KEYS[3], 0, excess - 1)
+    redis.call('DEL', unpack(evicted))
+    redis.call('ZREMRANGEBYRANK', KEYS[3], 0, excess - 1)
+end
+return 1
+"""
+
+# stored instead of the page of a month too big to be cached, a page is always a JSON array
+_TOO_BIG = "too_big"
+
+
+class PostCache:
+    """Read-through cache of the stored posts of a channel, one page per (channel, month) of pb_date.
+
+    Pages are compact JSON arrays and expire after POST_CACHE_TTL. Past POST_CACHE_MAX_KEYS pages
+    the least recently read ones are evicted. Every ingest invalidates the pages it added posts to
+    and bumps their generation, so a page loaded before the ingest is never stored after it.
+    A month over POST_CACHE_MAX_MONTH_POSTS is cached as a marker, so it is not read twice to find that out.
+    """
+
+    def __init__(self, rds: Redis) -> None:
+        self._rds = rds
+        self._lru_key = str(RedisTask.post_cache_lru.value)
+        self._stats_key = str(RedisTask.post_cache_stats.value)
+        self._store = rds.register_script(_STORE_PAGE_LUA)
+
+    @staticmethod
+    def _key(channel_name: str, month: datetime) -> str:
+        return f"{RedisTask.post_cache.value}:{channel_name}:{month:%Y-%m}"
+
+    @staticmethod
+    def _generation_key(page_key: str) -> str:
+        return f"{RedisTask.post_cache_generations.value}:{page_key}"
+
+    async def get(self, channel_name: str, month: datetime) -> tuple[list[StoredPost] | None, int, bool]:
+        """Returns the cached page, or None and the generation to pass to `set` once the page is loaded.
+
+        The flag is set for a month marked too big, it is read from postgres without loading its page.
+        """
+        key = self._key(channel_name, month)
+        pipe = self._rds.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.get(self._generation_key(key))
+        raw, generation = await pipe.execute()
+        pipe = self._rds.pipeline(transaction=False)
+        if raw is None:
+            pipe.hincrby(self._stats_key, "misses", 1)
+        else:
+            pipe.hincrby(self._stats_key, "hits", 1)
+            pipe.zadd(self._lru_key, {key: time.time()}, xx=True)
+        await pipe.execute()
+        if raw is None or raw.decode("utf-8") == _TOO_BIG:
+            return None, int(generation or 0), raw is not None
+        return (
+            [
+                StoredPost(channel_name=channel_name, post_id=post_id, pb_date=datetime.fromisoformat(pb_date), content=content, link=link)
+                for post_id, pb_date, content, link in json.loads(raw)
+            ],
+            int(generation or 0),
+            False,
+        )
+
+    async def set(self, channel_name: str, month: datetime, posts: list[StoredPost] | None, generation: int) -> bool:
+        """Stores the page of a month, None marks the month too big to be cached."""
+        key = self._key(channel_name, month)
+        page = _TOO_BIG
+        if posts is not None:
+            page = json.dumps([[post.post_id, post.pb_date.isoformat(), post.content, post.link] for post in posts], separators=(",", ":"), ensure_ascii=False)
+        stored = await self._store(
+            keys=[key, self._generation_key(key), self._lru_key],
+            args=[generation, page, settings.POST_CACHE_TTL, time.time(), settings.POST_CACHE_MAX_KEYS],
+        )
+        return bool(stored)
+
+    async def invalidate(self, pages: Iterable[tuple[str, datetime]]) -> None:
+        keys = sorted({self._key(channel_name, month_start(month)) for channel_name, month in pages})
+        if not keys:
+            return
+        pipe = self._rds.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(self._generation_key(key))
+            pipe.expire(self._generation_key(key), 2 * settings.POST_CACHE_TTL)
+        pipe.delete(*keys)
+        pipe.zrem(self._lru_key, *keys)
+        await pipe.execute()
+
+    async def stats(self) -> dict[str, int]:
+        raw = await self._rds.hgetall(self._stats_key)
+        stats = {"hits": 0, "misses": 0} | {name.decode("utf-8"): int(value) for name, value in raw.items()}
+        stats["pages"] = await self._rds.zcard(self._lru_key)
+        return stats
+
+
+post_cache = PostCache(Redis())
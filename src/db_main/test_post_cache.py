@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+import fakeredis
+
+from src.db_main.post_cache import PostCache
+from src.dto.post import StoredPost
+
+_MONTH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+async def test_post_cache() -> None:
+    cache = PostCache(fakeredis.FakeAsyncRedis())
+    post = StoredPost(channel_name="c", post_id=1, pb_date=_MONTH, content="text", link="https://t.me/c/1")
+
+    assert await cache.get("c", _MONTH) == (None, 0, False)
+    assert await cache.set("c", _MONTH, [post], 0)
+    assert await cache.get("c", _MONTH) == ([post], 0, False)
+
+    await cache.invalidate([("c", _MONTH)])
+    assert not await cache.set("c", _MONTH, [post], 0)
+    assert await cache.set("c", _MONTH, None, 1)
+    assert await cache.get("c", _MONTH) == (None, 1, True)
+    assert await cache.stats() == {"hits": 2, "misses": 1, "pages": 1}
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class DbPoolMetrics(BaseModel):
+    pool_size: int
+    max_overflow: int
+    checked_out: int
+    overflow: int
+    saturation: float  # checked out connections / (pool_size + max_overflow)
+    checkouts: int
+    checkout_timeouts: int
+    checkout_seconds_avg: float
+    checkout_seconds_max: float
@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 from enum import Enum, StrEnum, unique
 from pathlib import Path
+from typing import Any
 
 from pydantic import BaseModel, HttpUrl
 
@@ -13,6 +14,54 @@ class Post(BaseModel):
     link: HttpUrl
     media: dict[str, str] | None
 
+
+class PostRecord:
+    """Compact post of the ingest pipeline, between the scraper response and the DB and file writers.
+
+    Already validated, with the link kept as a plain string; converted to Post only at API boundaries.
+    """
+
+    __slots__ = ("channel_name", "content", "link", "media", "pb_date", "post_id")
+
+    def __init__(self, channel_name: str, post_id: int, content: str, pb_date: datetime, link: str, media: dict[str, str] | None = None) -> None:
+        self.channel_name = channel_name
+        self.post_id = post_id
+        self.content = content
+        self.pb_date = pb_date
+        self.link = link
+        self.media = media
+
+    def __repr__(self) -> str:
+        return f"PostRecord(channel_name={self.channel_name!r}, post_id={self.post_id!r}, pb_date={self.pb_date!r})"
+
+    @classmethod
+    def from_post(cls, post: Post) -> "PostRecord":
+        return cls(post.channel_name, post.post_id, post.content, post.pb_date, str(post.link), post.media)
+
+    def to_post(self) -> Post:
+        return Post(channel_name=self.channel_name, post_id=self.post_id, content=self.content, pb_date=self.pb_date, link=HttpUrl(self.link), media=self.media)
+
+    def to_dict(self) -> dict[str, Any]:
+        # same keys and order as Post
+        return {
+            "channel_name": self.channel_name,
+            "post_id": self.post_id,
+            "content": self.content,
+            "pb_date": self.pb_date,
+            "link": self.link,
+            "media": self.media,
+        }
+
+
+class StoredPost(BaseModel):
+    """A post as read back from tg_posts."""
+
+    channel_name: str
+    post_id: int
+    pb_date: datetime
+    content: str
+    link: str
+
 @unique
 class Source(Enum):
     YOUTUBE = "youtube"
@@ -7,9 +7,46 @@ from pydantic import BaseModel
 class RedisTask(Enum):
     channel_tasks= 'channel_tasks',
     counter_of_workers='cow'
+    manager_events = 'manager_events'
+    dispatcher_heartbeat = 'dispatcher_heartbeat'
+    manager_lock = 'manager_lock'
+    running_tasks = 'running_tasks'
+    running_leases = 'running_leases'
+    pending_tasks = 'pending_tasks'
+    counter_of_workers_override = 'cow_override'
+    scraper_calls = 'scraper_calls'
+    sharded_channels = 'sharded_channels'
+    task_shards = 'task_shards'
+    shard_sequence = 'shard_sequence'
+    task_groups = 'task_groups'
+    coverage = 'coverage'
+    channel_priorities = 'channel_priorities'
+    scraper_rate_limit = 'scraper_rate_limit'
+    scraper_breaker = 'scraper_breaker'
+    dead_letter = 'dead_letter'
+    channel_failures = 'channel_failures'
+    db_pool_metrics = 'db_pool_metrics'
+    post_cache = 'post_cache'
+    post_cache_generations = 'post_cache_gen'
+    post_cache_lru = 'post_cache_lru'
+    post_cache_stats = 'post_cache_stats'
+    seen_posts = 'seen_posts'
+    checkpoints = 'checkpoint'
+
+
+class ManagerEvent(Enum):
+    enqueued = 'enqueued'
+    finished = 'finished'
+
 
 class Task(BaseModel):
     source: str
     channel_name: str
     dt_to: datetime
     dt_from: datetime
+    group_id: str | None = None  # set on shards of a bigger queued range
+
+
+class RunningTask(BaseModel):
+    task_name: str
+    task: Task
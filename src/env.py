@@ -8,6 +8,8 @@ from typing import Final
 from pydantic import PostgresDsn, SecretStr
 from pydantic_settings import BaseSettings
 
+from src.common.moment import Window
+
 ROOT_PATH = Path(__file__).parent.parent
 
 
@@ -61,6 +63,70 @@ class Settings(BaseSettings):
     CELERY_BROKER: SecretStr = SecretStr("")
 
     DB_URL: PostgresDsn
+    COPY_MIN_ROWS: int = 5000  # smaller ingest batches use a plain INSERT instead of COPY
+    DB_POOL_SIZE: int = 5  # connections kept open per process
+    DB_MAX_OVERFLOW: int = 10  # extra connections opened under load and closed when returned, raised in workers to cover every task thread
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 1800  # seconds after which a connection is reopened
+    POSTS_STREAM_CHUNK: int = 1000  # rows fetched per round trip of the /posts server-side cursor
+    POSTS_SEARCH_PAGE_SIZE: int = 50
+    POST_CACHE_TTL: int = 3600  # seconds a cached (channel, month) page lives
+    POST_CACHE_MAX_KEYS: int = 1000  # least recently read pages are evicted past this count
+    POST_CACHE_MAX_MONTH_POSTS: int = 20000  # bigger months are always read from postgres
+
+    SCRAPER_URL: str = "http://localhost:50001"
+
+    INGEST_BATCH_SIZE: int = 5000  # posts of a streamed scraper response validated and stored together, full batches reach COPY_MIN_ROWS
+    CHECKPOINT_TTL: int = 7 * 24 * 3600  # seconds the progress of an unfinished task is kept for its retries
+    WORKER_ASYNC_CONCURRENCY: int = 32  # task threads and http connections of a worker process, the -c of make app_celery_async
+    WORKER_PROCESSES: int = 1  # app_celery_async processes of the cluster
+
+    # manager
+    MANAGER_WAKEUP_TIMEOUT: int = 5  # seconds the dispatcher sleeps without events before a tick
+    MANAGER_HEARTBEAT_TTL: int = 30  # seconds beat waits for a silent dispatcher before taking over
+    MANAGER_LOCK_TTL: int = 60  # seconds the dispatch lock outlives a manager that died in a round, it is renewed while the round runs
+    TASK_LEASE_TTL: int = 60  # a running task must heartbeat within this many seconds
+    TASK_PENDING_TTL: int = 6 * 3600  # a dispatched task not picked up by a worker within this many seconds is taken for lost
+
+    # adaptive concurrency of parse_api tasks
+    CONCURRENCY_MIN: int = 1
+    CONCURRENCY_MAX: int = 16  # capped by the task threads of the cluster, see concurrency_max
+    CONCURRENCY_DEFAULT: int = 3
+    CONCURRENCY_LATENCY_TARGET: float = 30.0  # seconds to the response headers; slower scraper answers count as overload
+    CONCURRENCY_MAX_ERROR_RATE: float = 0.2  # share of failed calls in a window that triggers a decrease
+    CONCURRENCY_DECREASE_FACTOR: float = 0.5
+
+    # sharding of queued ranges
+    TASK_SHARD_WINDOW: Window = Window.MONTH
+    TASK_SHARDS_PER_CHANNEL: int = 4  # shards of one channel allowed to run at the same time
+
+    # fair share between sources, keyed by Source value
+    SOURCE_WEIGHTS: dict[str, int] = {}
+    SOURCE_CONCURRENCY_LIMITS: dict[str, int] = {}
+
+    # protection of the scraper
+    SCRAPER_RATE: float = 1.0  # requests per second over all workers
+    SCRAPER_BURST: int = 5
+    SCRAPER_BREAKER_THRESHOLD: int = 5  # failures in a row that open the circuit breaker
+    SCRAPER_BREAKER_COOLDOWN: int = 30  # seconds, doubles with every consecutive trip
+    SCRAPER_RETRY_DELAY: int = 10  # seconds before the first retry, doubles with every retry
+    SCRAPER_RETRY_MAX_DELAY: int = 900
+    SCRAPER_MAX_RETRIES: int = 5
+    DEAD_LETTER_AFTER: int = 3  # failed tasks in a row that move a channel to the dead letter
+
+    # known post ids of every channel, to drop re-scraped posts before they are validated
+    SEEN_POSTS_CAPACITY: int = 100_000  # posts the first filter layer of a channel holds, each next layer holds twice as many
+    SEEN_POSTS_FP_RATE: float = 0.001  # chance that a new post is taken for a known one and dropped
+
+    @property
+    def concurrency_max(self) -> int:
+        # more parse_api tasks than worker threads would only wait in the broker
+        return min(self.CONCURRENCY_MAX, self.WORKER_PROCESSES * self.WORKER_ASYNC_CONCURRENCY)
+
+    @property
+    def worker_db_max_overflow(self) -> int:
+        # every task thread of a worker process may hold a connection at once
+        return max(self.DB_MAX_OVERFLOW, self.WORKER_ASYNC_CONCURRENCY - self.DB_POOL_SIZE)
 
     @property
     def is_local(self) -> bool:
@@ -79,6 +79,15 @@ class JSONDecoderError(ApiResponseError):
         self.post_id = post_id
 
 
+class InvalidPostsCursorError(ApiError):
+    http_status_code: int = 422
+
+    def __init__(self, message: str = "after_pb_date and after_post_id must be given together") -> None:
+        super().__init__(message)
+        self.error_type = type(self).__name__
+        self.error_message = str(self)
+
+
 def fmt_err(err: Exception | str | None, tb: Any = None) -> str:
     if isinstance(err, Exception):
         tb = f"\n\n{tb}" if tb else ""